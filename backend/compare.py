@@ -0,0 +1,250 @@
+"""Streaming comparison of output json files: top-level lists (rentals,
+missing_rentals...) are decoded and compared item by item, so memory is
+bounded by the largest rental instead of the file size. Top-level keys
+may come in any order: entries out of expected order are looked up by key,
+reading output file again.
+Run: python compare.py output.json expected_output.json [max differences]"""
+
+import sys
+import json
+from itertools import groupby
+from operator import itemgetter
+
+CHUNK_SIZE = 1 << 16
+WHITESPACE = " \t\n\r"
+
+
+class JsonStream:
+    """Class decoding a json text file one value at a time."""
+
+    def __init__(self, read_file, chunk_size=CHUNK_SIZE):
+        """Construct stream from text file object."""
+        self.read_file = read_file
+        self.chunk_size = chunk_size
+        self.buffer = ""
+        self.position = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def read_more(self, size):
+        """Append at least size characters to buffer, unless end of file.
+        Return False at end of file."""
+        if self.eof:
+            return False
+        chunk = self.read_file.read(max(size, self.chunk_size))
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.position:] + chunk
+        self.position = 0
+        return True
+
+    def peek(self):
+        """Skip whitespace and return next character, "" at end of file."""
+        while True:
+            while self.position < len(self.buffer) and \
+                    self.buffer[self.position] in WHITESPACE:
+                self.position += 1
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+            if not self.read_more(self.chunk_size):
+                return ""
+
+    def expect(self, characters):
+        """Consume next character, one of characters. Return it."""
+        character = self.peek()
+        if not character or character not in characters:
+            raise ValueError("Expected %s at offset %d, found %r" %
+                             (" or ".join(characters), self.position,
+                              character))
+        self.position += 1
+        return character
+
+    def decode(self):
+        """Decode and return next json value."""
+        self.peek()
+        size = self.chunk_size
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer,
+                                                     self.position)
+            except json.JSONDecodeError:
+                if not self.read_more(size):
+                    raise
+            else:
+                # A number ending the buffer may continue in next chunk
+                if end < len(self.buffer) or not self.read_more(size):
+                    self.position = end
+                    return value
+            # Value bigger than buffer: read more each retry
+            size *= 2
+
+    def iter_items(self):
+        """Yield (key, index, value) for each top-level object entry: list
+        items one by one with their index, other values with index None."""
+        self.expect("{")
+        if self.peek() == "}":
+            return
+        while True:
+            key = self.decode()
+            self.expect(":")
+            if self.peek() == "[":
+                self.position += 1
+                index = 0
+                if self.peek() != "]":
+                    while True:
+                        yield key, index, self.decode()
+                        index += 1
+                        if self.expect(",]") == "]":
+                            break
+                else:
+                    self.position += 1
+            else:
+                yield key, None, self.decode()
+            if self.expect(",}") == "}":
+                return
+
+
+def iter_differences(output, expected, path):
+    """Yield (path, output, expected) for each difference of two decoded
+    json values."""
+    if isinstance(output, dict) and isinstance(expected, dict):
+        for key in output:
+            if key not in expected:
+                yield "%s.%s" % (path, key), output[key], None
+            else:
+                yield from iter_differences(output[key], expected[key],
+                                            "%s.%s" % (path, key))
+        for key in expected:
+            if key not in output:
+                yield "%s.%s" % (path, key), None, expected[key]
+    elif isinstance(output, list) and isinstance(expected, list) and \
+            len(output) == len(expected):
+        for index, (item, expected_item) in enumerate(zip(output, expected)):
+            yield from iter_differences(item, expected_item,
+                                        "%s[%d]" % (path, index))
+    elif output != expected:
+        yield path, output, expected
+
+
+def iter_entries(read_file):
+    """Yield (key, items) for each top-level entry of json text file
+    object: items yields (index, value) as JsonStream.iter_items."""
+    for key, items in groupby(JsonStream(read_file).iter_items(),
+                              itemgetter(0)):
+        yield key, (item[1:] for item in items)
+
+
+def iter_entry(path, key):
+    """Yield (index, value) of top-level entry key of json file, nothing if
+    key is missing."""
+    with open(path) as read_file:
+        for entry_key, items in iter_entries(read_file):
+            if entry_key == key:
+                yield from items
+                return
+
+
+def get_item_path(key, index):
+    """Return path of a top-level entry."""
+    return key if index is None else "%s[%d]" % (key, index)
+
+
+def get_item_id(value):
+    """Return id of a top-level list item, e.g. rental id."""
+    if isinstance(value, dict):
+        return value.get('id', value.get('rental_id'))
+    return None
+
+
+def compare_files(output_path, expected_path, max_differences=1):
+    """Compare output and expected json files in bounded memory, top-level
+    entries matched by key.
+    Return up to max_differences differences dicts: path, id of the
+    rental (or top-level item), output and expected values."""
+    differences = []
+
+    def add(path, item_id, output, expected):
+        """Add difference, return True if enough were found."""
+        differences.append({'path': path, 'id': item_id,
+                            'output': output, 'expected': expected})
+        return len(differences) >= max_differences
+
+    missing = object()
+
+    def compare_entry(key, output_items, expected_items):
+        """Compare items of top-level entry key, return True if enough
+        differences were found."""
+        while True:
+            index, output = next(output_items, (None, missing))
+            expected_index, expected = next(expected_items, (None, missing))
+            if output is missing and expected is missing:
+                return False
+            if output is missing or expected is missing or \
+                    index != expected_index:
+                # Lists lengths or types differ: stop at first misalignment
+                return add(
+                    get_item_path(key, index) if output is not missing
+                    else get_item_path(key, expected_index),
+                    get_item_id(expected if output is missing else output),
+                    None if output is missing else output,
+                    None if expected is missing else expected)
+            path = get_item_path(key, index)
+            for difference in iter_differences(output, expected, path):
+                if add(difference[0], get_item_id(expected), *difference[1:]):
+                    return True
+
+    expected_keys = set()
+    with open(output_path) as output_file, \
+            open(expected_path) as expected_file:
+        output_entries = iter_entries(output_file)
+        # Output entries are read along expected ones until keys order
+        # differs, then looked up by key
+        aligned = True
+        for key, expected_items in iter_entries(expected_file):
+            expected_keys.add(key)
+            if aligned:
+                output_key, output_items = next(output_entries,
+                                                (None, None))
+                aligned = output_key == key
+            if not aligned:
+                output_items = iter_entry(output_path, key)
+            if compare_entry(key, output_items, expected_items):
+                return differences
+
+        # Output entries missing from expected file
+        if not aligned:
+            output_file.seek(0)
+            output_entries = iter_entries(output_file)
+        for key, output_items in output_entries:
+            if key not in expected_keys and \
+                    compare_entry(key, output_items, iter(())):
+                return differences
+    return differences
+
+
+def format_differences(differences):
+    """Return human readable differences."""
+    return "\n".join("%s (id %s): output %s, expected %s" % (
+        difference['path'], difference['id'],
+        json.dumps(difference['output']), json.dumps(difference['expected']))
+                     for difference in differences)
+
+
+def assert_same_output(output_path, expected_path, max_differences=10):
+    """Assert output and expected json files are equal, listing up to
+    max_differences differences."""
+    differences = compare_files(output_path, expected_path, max_differences)
+    assert not differences, "Output differs from %s:\n%s" % (
+        expected_path, format_differences(differences))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) in (3, 4):
+        DIFFERENCES = compare_files(
+            sys.argv[1], sys.argv[2],
+            int(sys.argv[3]) if len(sys.argv) == 4 else 10)
+        if DIFFERENCES:
+            print(format_differences(DIFFERENCES))
+        sys.exit(1 if DIFFERENCES else 0)
+    print(__doc__)
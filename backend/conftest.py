@@ -0,0 +1,36 @@
+"""Pytest options and fixtures to run level tests against large golden
+files, compared in bounded memory by compare module.
+Run: pytest test.py --golden-input input.json --golden-expected
+expected_output.json [--max-differences 10] (in a level folder)"""
+
+import pytest
+from compare import assert_same_output
+
+
+def pytest_addoption(parser):
+    """Add golden files options."""
+    parser.addoption("--golden-input", default=None,
+                     help="Input json of a golden files test")
+    parser.addoption("--golden-expected", default=None,
+                     help="Expected output json of a golden files test")
+    parser.addoption("--max-differences", type=int, default=10,
+                     help="Differences listed by golden files test")
+
+
+@pytest.fixture
+def golden_files(request):
+    """Return golden input and expected output paths, skip test if not
+    given."""
+    input_path = request.config.getoption("--golden-input")
+    expected_path = request.config.getoption("--golden-expected")
+    if input_path is None or expected_path is None:
+        pytest.skip("--golden-input and --golden-expected not given")
+    return input_path, expected_path
+
+
+@pytest.fixture
+def compare_output(request):
+    """Return function asserting an output file equals expected file."""
+    max_differences = request.config.getoption("--max-differences")
+    return lambda output_path, expected_path: assert_same_output(
+        output_path, expected_path, max_differences)
@@ -31,3 +31,11 @@ def test_files():
         expected_output = json.load(read_file)
 
     assert output == expected_output
+
+def test_golden_files(golden_files, compare_output, tmp_path):
+    """Compare output of golden input and golden expected output files."""
+    input_path, expected_path = golden_files
+    output_path = str(tmp_path / "output.json")
+    main.process_write_data(os.path.abspath(input_path), output_path)
+
+    compare_output(output_path, expected_path)
@@ -0,0 +1,168 @@
+"""Defines QuantileSketch: mergeable quantile sketch with relative accuracy
+in bounded memory (logarithmic buckets).
+Defines PriceAnalytics: pricing stage keeping sketches of driver debit,
+duration and each actor's fee, per car and overall, written as a summary
+json.
+"""
+import json
+import math
+
+# Quantiles reported in summary
+QUANTILES = (('p50', 0.5), ('p95', 0.95), ('p99', 0.99))
+
+
+class QuantileSketch:
+    """Class sketching a values distribution: values are counted in
+    logarithmic buckets, so any quantile is within relative_accuracy of
+    the exact one and memory only grows with the log of values range."""
+
+    def __init__(self, relative_accuracy=0.01):
+        """Construct empty sketch."""
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        # {bucket index: count} for positive and negative values magnitude
+        self.positive = {}
+        self.negative = {}
+        self.zeros = 0
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def add(self, value):
+        """Add value to sketch."""
+        if value > 0:
+            index = math.ceil(math.log(value) / self.log_gamma)
+            self.positive[index] = self.positive.get(index, 0) + 1
+        elif value < 0:
+            index = math.ceil(math.log(-value) / self.log_gamma)
+            self.negative[index] = self.negative.get(index, 0) + 1
+        else:
+            self.zeros += 1
+
+        if not self.count:
+            self.min = self.max = value
+        elif value < self.min:
+            self.min = value
+        elif value > self.max:
+            self.max = value
+        self.count += 1
+        self.total += value
+
+    def merge(self, other):
+        """Add values of another sketch with same accuracy. Return self."""
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Can't merge sketches with different accuracy")
+        for buckets, other_buckets in ((self.positive, other.positive),
+                                       (self.negative, other.negative)):
+            for index, count in other_buckets.items():
+                buckets[index] = buckets.get(index, 0) + count
+        self.zeros += other.zeros
+        if other.count:
+            self.min = other.min if not self.count else min(self.min,
+                                                            other.min)
+            self.max = other.max if not self.count else max(self.max,
+                                                            other.max)
+        self.count += other.count
+        self.total += other.total
+        return self
+
+    def get_value(self, index):
+        """Return value representing bucket index."""
+        return 2 * self.gamma ** index / (self.gamma + 1)
+
+    def quantile(self, fraction):
+        """Return approximate quantile, fraction between 0 and 1."""
+        if not self.count:
+            return None
+
+        rank = fraction * (self.count - 1)
+        seen = 0
+        # Negative values from largest magnitude, zeros, positive values
+        for index in sorted(self.negative, reverse=True):
+            seen += self.negative[index]
+            if seen > rank:
+                return max(-self.get_value(index), self.min)
+        seen += self.zeros
+        if seen > rank:
+            return 0
+        for index in sorted(self.positive):
+            seen += self.positive[index]
+            if seen > rank:
+                return min(self.get_value(index), self.max)
+        return self.max
+
+    def get_summary(self):
+        """Return summary dictionary: count, min, max, mean and quantiles."""
+        summary = {'count': self.count, 'min': self.min, 'max': self.max}
+        if self.count:
+            summary['mean'] = round(self.total / self.count, 2)
+            for name, fraction in QUANTILES:
+                summary[name] = round(self.quantile(fraction))
+        return summary
+
+
+class PriceAnalytics:
+    """Class keeping price distribution sketches of priced rentals, per car
+    and overall."""
+
+    def __init__(self, relative_accuracy=0.01):
+        """Construct empty analytics."""
+        self.relative_accuracy = relative_accuracy
+        # {metric: QuantileSketch}
+        self.overall = {}
+        # {car_id: {metric: QuantileSketch}}
+        self.cars = {}
+
+    def add_value(self, sketches, metric, value):
+        """Add value to metric sketch of sketches dict."""
+        try:
+            sketch = sketches[metric]
+        except KeyError:
+            sketch = sketches[metric] = QuantileSketch(
+                self.relative_accuracy)
+        sketch.add(value)
+
+    def add(self, rental):
+        """Add priced rental to sketches."""
+        try:
+            car_sketches = self.cars[rental.car_id]
+        except KeyError:
+            car_sketches = self.cars[rental.car_id] = {}
+
+        values = [('price', rental.price), ('duration', rental.duration)]
+        values.extend(rental.commission.items())
+        for metric, value in values:
+            self.add_value(self.overall, metric, value)
+            self.add_value(car_sketches, metric, value)
+
+    def merge(self, other):
+        """Add sketches of another PriceAnalytics, e.g. from another shard.
+        Return self."""
+        for sketches, other_sketches in [(self.overall, other.overall)] + [
+                (self.cars.setdefault(car_id, {}), car_sketches)
+                for car_id, car_sketches in other.cars.items()]:
+            for metric, sketch in other_sketches.items():
+                if metric in sketches:
+                    sketches[metric].merge(sketch)
+                else:
+                    sketches[metric] = QuantileSketch(
+                        self.relative_accuracy).merge(sketch)
+        return self
+
+    def get_summary(self):
+        """Return summary dictionary, overall and per car."""
+        return {
+            'overall': {metric: sketch.get_summary()
+                        for metric, sketch in self.overall.items()},
+            'cars': [dict({'car_id': car_id}, **{
+                metric: sketch.get_summary()
+                for metric, sketch in sketches.items()})
+                     for car_id, sketches in self.cars.items()]
+        }
+
+    def dump(self, write_file):
+        """Write summary json to text file object."""
+        json.dump(self.get_summary(), write_file, indent=2)
+        write_file.write("\n")
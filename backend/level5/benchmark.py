@@ -0,0 +1,88 @@
+"""Benchmark PricingEngine scaling across thread counts.
+Every thread prices its share of a generated input with its own config:
+several pricing configs run side by side in one process. Scaling above 1x
+requires a free-threaded CPython build (3.13t+).
+Run: python benchmark.py [rentals] [max threads]"""
+
+import sys
+import time
+import random
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+from engine import PricingEngine, input_hook
+from rent import cfg
+
+
+def generate_input(rentals_count, cars_count=100, seed=0):
+    """Return generated main input dict, rentals as unpriced Rental.
+    Each car is booked one rental after the other: no double-booked car is
+    reported while pricing."""
+    generator = random.Random(seed)
+    # First free day of each car
+    free_days = [date(2015, 1, 1)] * (cars_count + 1)
+    rentals = []
+    for rental_id in range(1, rentals_count + 1):
+        car_id = generator.randint(1, cars_count)
+        start_date = free_days[car_id] + timedelta(
+            days=generator.randrange(3))
+        end_date = start_date + timedelta(days=generator.randrange(30))
+        free_days[car_id] = end_date + timedelta(days=1)
+        rentals.append(input_hook({
+            'id': rental_id,
+            'car_id': car_id,
+            'start_date': start_date.isoformat(),
+            'end_date': end_date.isoformat(),
+            'distance': generator.randrange(2000)}))
+
+    return {
+        'cars': [{'id': car_id,
+                  'price_per_day': generator.randrange(500, 5000, 100),
+                  'price_per_km': generator.randrange(5, 30)}
+                 for car_id in range(1, cars_count + 1)],
+        'rentals': rentals,
+        'options': [{'id': option_id,
+                     'rental_id': generator.randint(1, rentals_count),
+                     'type': generator.choice(list(cfg['options_prices']))}
+                    for option_id in range(1, rentals_count // 2 + 1)]
+    }
+
+
+def get_configs(count):
+    """Return count pricing configs with different commission bases."""
+    return [dict(cfg, commission_base=0.2 + 0.01 * index)
+            for index in range(count)]
+
+
+def run(data, threads):
+    """Price data once per thread, each with its own engine. Backend
+    messages are kept in lists: no stdout lock contention between threads.
+    Return elapsed seconds."""
+    engines = [PricingEngine(config) for config in get_configs(threads)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(lambda engine: engine.price_rentals(
+            data, messages=[]), engines))
+    return time.perf_counter() - start
+
+
+def main(rentals_count=100000, max_threads=8):
+    """Print throughput and scaling for 1 to max_threads threads."""
+    data = generate_input(rentals_count)
+    gil_enabled = getattr(sys, '_is_gil_enabled', lambda: True)()
+    print("Python %s, GIL %s" % (sys.version.split()[0],
+                                 "enabled" if gil_enabled else "disabled"))
+
+    threads = 1
+    base_throughput = None
+    while threads <= max_threads:
+        elapsed = run(data, threads)
+        throughput = rentals_count * threads / elapsed
+        base_throughput = base_throughput or throughput
+        print("%2d threads: %10.0f rentals/s, %.2fx" %
+              (threads, throughput, throughput / base_throughput))
+        threads *= 2
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:3]])
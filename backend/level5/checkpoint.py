@@ -0,0 +1,106 @@
+"""Resumable pricing batch: rentals are priced and streamed to a partial
+output file, the rental index and output offset already written are
+committed to a checkpoint file every few rentals. After a crash the run
+restarts from the last commit and final output is identical to an
+uninterrupted run."""
+
+import os
+import json
+
+from rent import pipeline
+from serializer import RentalWriter
+from engine import input_hook
+
+
+def get_input_version(input_path):
+    """Return input file modification time and size: a checkpoint of a
+    changed input is not resumed."""
+    stat = os.stat(input_path)
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def read_checkpoint(checkpoint_path, input_version, compact, duplicates):
+    """Return checkpoint dict if it can resume this run, else None."""
+    try:
+        with open(checkpoint_path) as read_file:
+            checkpoint = json.load(read_file)
+    except (OSError, ValueError):
+        return None
+
+    if checkpoint.get('input_version') != input_version or \
+            checkpoint.get('compact') != compact or \
+            checkpoint.get('duplicates') != duplicates:
+        return None
+    return checkpoint
+
+
+def write_checkpoint(checkpoint_path, checkpoint):
+    """Atomically replace checkpoint file."""
+    temporary_path = checkpoint_path + ".tmp"
+    with open(temporary_path, "w") as write_file:
+        json.dump(checkpoint, write_file)
+        write_file.flush()
+        os.fsync(write_file.fileno())
+    os.replace(temporary_path, checkpoint_path)
+
+
+def commit(write_file, checkpoint_path, checkpoint):
+    """Sync partial output to disk, then commit its offset."""
+    write_file.flush()
+    os.fsync(write_file.fileno())
+    checkpoint['offset'] = write_file.tell()
+    write_checkpoint(checkpoint_path, checkpoint)
+
+
+def process_write_resumable(input_path, output_path, checkpoint_path=None,
+                            commit_every=1000, compact=False,
+                            duplicates=None):
+    """Open input json, compute rentals costs and stream output json,
+    resuming from checkpoint_path (output_path + ".checkpoint" by default)
+    if a previous run on the same input died.
+    duplicates: repeated ids policy, rent.pipeline policy by default.
+    Raise ValueError if commit_every is below 1."""
+    if commit_every < 1:
+        raise ValueError("commit_every must be at least 1: %r" %
+                         commit_every)
+    if duplicates is None:
+        duplicates = pipeline.duplicates
+    rent_pipeline = pipeline.with_duplicates(duplicates)
+    if checkpoint_path is None:
+        checkpoint_path = output_path + ".checkpoint"
+    partial_path = output_path + ".partial"
+
+    with open(input_path) as read_file:
+        data = json.load(read_file, object_hook=input_hook)
+    cars, rentals, errors = rent_pipeline.prepare_rentals(data)
+
+    input_version = get_input_version(input_path)
+    checkpoint = read_checkpoint(checkpoint_path, input_version, compact,
+                                 duplicates)
+    if checkpoint is not None and os.path.exists(partial_path):
+        # Drop rentals written after last commit
+        write_file = open(partial_path, "r+b")
+        write_file.truncate(checkpoint['offset'])
+        write_file.seek(checkpoint['offset'])
+    else:
+        checkpoint = {'input_version': input_version, 'compact': compact,
+                      'duplicates': duplicates, 'rental_index': 0,
+                      'offset': 0}
+        write_file = open(partial_path, "wb")
+
+    with write_file:
+        writer = RentalWriter(write_file, compact, checkpoint['rental_index'])
+        for index in range(checkpoint['rental_index'], len(rentals)):
+            rent_pipeline.price_rental(rentals[index], cars)
+            writer.write_rental(rentals[index])
+            if (index + 1) % commit_every == 0:
+                checkpoint['rental_index'] = index + 1
+                commit(write_file, checkpoint_path, checkpoint)
+        writer.close(errors)
+        write_file.write(b"\n")
+        write_file.flush()
+        os.fsync(write_file.fileno())
+
+    os.replace(partial_path, output_path)
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
@@ -0,0 +1,95 @@
+"""Defines load_engine that reads pricing config json file and returns a
+PricingEngine compiled from it.
+Defines ConfigWatcher: watches config file and swaps in a new compiled
+engine when it changes, for long-running processes.
+"""
+import os
+import json
+import threading
+
+from engine import PricingEngine
+
+
+class ConfigError(Exception):
+    """ConfigError class for exceptions: if config file can't be loaded"""
+
+    def __init__(self, path, error):
+        self.path = path
+        self.error = error
+
+    # Error message
+    def __str__(self):
+        return "Invalid pricing config %s: %s" % (self.path, self.error)
+
+
+def load_engine(path):
+    """Return PricingEngine compiled from config json file."""
+    try:
+        with open(path) as read_file:
+            return PricingEngine(json.load(read_file))
+    except (OSError, ValueError, KeyError, TypeError, AttributeError) \
+            as load_error:
+        raise ConfigError(path, load_error) from load_error
+
+
+class ConfigWatcher:
+    """Class holding the engine compiled from a config file. Workers read
+    watcher.engine between batches: a changed file is compiled aside and
+    swapped in with one attribute assignment, pricing never pauses."""
+
+    def __init__(self, path):
+        """Construct watcher and compile config file."""
+        self.path = path
+        self.version = self.get_version()
+        self.engine = load_engine(path)
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def get_version(self):
+        """Return config file modification time and size."""
+        stat = os.stat(self.path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def refresh(self):
+        """Compile and swap config if file changed. Return True if swapped.
+        An invalid file keeps current engine."""
+        try:
+            version = self.get_version()
+        except OSError as error_msg:
+            # Config file being replaced: print/log on backend and keep
+            # pricing with current config.
+            print(error_msg)
+            return False
+        if version == self.version:
+            return False
+
+        self.version = version
+        try:
+            engine = load_engine(self.path)
+        except ConfigError as error_msg:
+            # Invalid config: print/log on backend and keep pricing with
+            # current config until file changes again.
+            print(error_msg)
+            return False
+
+        self.engine = engine
+        return True
+
+    def start(self, interval=1.0):
+        """Start thread refreshing config every interval seconds."""
+        self.stopped.clear()
+        self.thread = threading.Thread(target=self.watch, args=(interval,),
+                                       daemon=True)
+        self.thread.start()
+
+    def watch(self, interval):
+        """Refresh config every interval seconds until stopped."""
+        while not self.stopped.wait(interval):
+            self.refresh()
+
+    def stop(self):
+        """Stop refresh thread."""
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
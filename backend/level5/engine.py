@@ -0,0 +1,190 @@
+"""Defines PricingEngine: prices rentals from an immutable compiled config
+with the level 5 Pipeline and pricing stages of pricing module, returning
+PricedRental value objects. Engines share no mutable state: several configs
+can price the same input side by side in threads.
+Defines input_hook that takes input json and output unpriced Rental objects.
+"""
+from collections import namedtuple
+from types import MappingProxyType
+
+from rent import ACTORS, cfg, Rental
+from pricing import LAST_WINS, Pipeline, check_prices, get_base_price, \
+    get_commission, get_options_price, get_table_multiplier
+
+# Compiled config: read-only values of a cfg like dictionary
+CompiledConfig = namedtuple('CompiledConfig', [
+    'commission_base',  # Drivy commission part of base price
+    'insurance_part',  # Insurance part of the commission
+    'assistance_fee_per_day',
+    'options_prices'  # Read-only {option type: read-only {fee: price}}
+])
+
+
+class PricedRental(namedtuple('PricedRental', [
+        'id', 'car_id', 'start_date', 'end_date', 'duration', 'options',
+        'price', 'commission'])):
+    """Priced rental value object: same attributes and output as a priced
+    Rental."""
+    __slots__ = ()
+
+    def get_actions(self):
+        """Return actions: how much money must be
+        debited/credited for each actor."""
+        actions = [{"who": "driver", "type": "debit", "amount": self.price}]
+        actions.extend({"who": ACTORS[key],
+                        "type": "credit",
+                        "amount": amount}
+                       for key, amount in self.commission.items())
+        return actions
+
+    @classmethod
+    def from_rental(cls, rental):
+        """Return PricedRental of a priced or unpriced Rental."""
+        return cls(rental.id, rental.car_id, rental.start_date,
+                   rental.end_date, rental.duration, rental.options,
+                   rental.price, rental.commission)
+
+    def get_dict(self):
+        """Return output dictionary."""
+        return {
+            'id': self.id,
+            'options': [option['type'] for option in self.options],
+            'actions': self.get_actions()
+        }
+
+
+def compile_config(config):
+    """Return CompiledConfig from a cfg like dictionary."""
+    return CompiledConfig(
+        commission_base=config['commission_base'],
+        insurance_part=config['insurance_commission_part'],
+        assistance_fee_per_day=config['assistance_fee_per_day'],
+        options_prices=MappingProxyType({
+            name: MappingProxyType({
+                'owner_fee': prices.get('owner_fee', 0),
+                'drivy_fee': prices.get('drivy_fee', 0)})
+            for name, prices in config['options_prices'].items()}))
+
+
+def get_cfg(config):
+    """Return read-only cfg like dictionary of CompiledConfig, read by
+    pricing stages."""
+    return MappingProxyType({
+        'commission_base': config.commission_base,
+        'insurance_commission_part': config.insurance_part,
+        'assistance_fee_per_day': config.assistance_fee_per_day,
+        'options_prices': config.options_prices})
+
+
+def input_hook(dct):
+    """Hook called when loading json: return Rental objects without
+    computing costs, input dict is left for PricingEngine."""
+    if "car_id" in dct:
+        return Rental(dct)
+
+    return dct
+
+
+class PricingEngine:
+    """Class pricing rentals with one compiled config: level 5 pipeline on
+    copies of input rentals, with the config as cfg. Input rentals, cars
+    and options are only read: an engine can be shared between threads."""
+
+    def __init__(self, config=None):
+        """Construct engine from cfg like dictionary, rent.cfg by default."""
+        self.config = compile_config(cfg if config is None else config)
+        self.cfg = get_cfg(self.config)
+        # Level 5 Rental priced with engine cfg and pricing stages
+        self.rental_class = type(Rental.__name__, (Rental,), {
+            'cfg': self.cfg, 'pricing_stages': self.get_pricing_stages()})
+
+    def get_pricing_stages(self):
+        """Return pricing stages of engine rentals: level 5 stages."""
+        return Rental.pricing_stages
+
+    def get_pipeline(self, duplicates=LAST_WINS):
+        """Return level 5 pipeline of engine rentals with repeated ids
+        policy."""
+        return Pipeline(self.rental_class, duplicates, options=True,
+                        overlaps=True)
+
+    def copy_rental(self, rental, options=()):
+        """Return engine Rental copy of unpriced input Rental with options
+        list: pricing stages only change the copy."""
+        copy = object.__new__(self.rental_class)
+        copy.__dict__.update(rental.__dict__)
+        copy.options = list(options)
+        return copy
+
+    def get_base_price(self, duration, distance, price_per_day,
+                       price_per_km):
+        """Return days and distance price, excluding options."""
+        return get_base_price(get_table_multiplier(duration), distance,
+                              price_per_day, price_per_km)
+
+    def get_rental_base_price(self, rental, car):
+        """Return rental base price with car.
+        Raise NegativePrice if a price component is negative."""
+        price_per_day = car.get('price_per_day', 0)
+        price_per_km = car.get('price_per_km', 0)
+        check_prices(rental.duration, rental.distance, price_per_day,
+                     price_per_km)
+        return self.get_base_price(rental.duration, rental.distance,
+                                   price_per_day, price_per_km)
+
+    def get_options_prices(self, options):
+        """Return owner and drivy day prices of options list.
+        Raise OptionNotFound if an option is not configured."""
+        options_price = get_options_price(self.cfg, options)
+        return options_price['owner_fee'], options_price['drivy_fee']
+
+    def get_commission(self, base_price, duration, owner_options,
+                       drivy_options):
+        """Return commission dict of base price, duration and options day
+        prices."""
+        return get_commission(self.cfg, base_price, duration, {
+            'owner_fee': owner_options, 'drivy_fee': drivy_options})
+
+    def price(self, rental, car, options=()):
+        """Return PricedRental for rental with car and options list.
+        Raise NegativePrice or OptionNotFound as Rental.compute_costs()."""
+        priced = self.copy_rental(rental, options)
+        priced.compute_costs(car)
+        return PricedRental.from_rental(priced)
+
+    def prepare_rentals(self, dct, duplicates=LAST_WINS, messages=None):
+        """Select copies of the rentals of main input dict loaded with
+        input_hook, add options to them and check input, as
+        rent.prepare_rentals.
+        duplicates: repeated ids policy, see pricing.select_unique.
+        messages: list receiving backend messages instead of printing
+        them.
+        Return cars dict, engine rentals list and errors dict to be added
+        to output."""
+        return self.get_pipeline(duplicates).prepare_rentals(
+            dict(dct, rentals=[self.copy_rental(rental)
+                               for rental in dct['rentals']]),
+            messages)
+
+    def price_rentals(self, dct, stages=(), duplicates=LAST_WINS,
+                      messages=None):
+        """Price every rental in main input dict loaded with input_hook and
+        add every priced rental to stages.
+        duplicates: repeated ids policy, see pricing.select_unique.
+        messages: list receiving backend messages instead of printing
+        them, e.g. for threads sharing stdout.
+        Return PricedRental list and errors dict, as rent.price_rentals."""
+        rentals, errors = self.get_pipeline(duplicates).price_rentals(
+            dict(dct, rentals=[self.copy_rental(rental)
+                               for rental in dct['rentals']]),
+            stages, messages)
+        return [PricedRental.from_rental(rental) for rental in rentals], \
+            errors
+
+    def get_output(self, dct):
+        """Return output dictionary for main input dict loaded with
+        input_hook, as rent.load_hook."""
+        priced_rentals, errors = self.price_rentals(dct)
+        result = {'rentals': [priced.get_dict() for priced in priced_rentals]}
+        result.update(errors)
+        return result
@@ -0,0 +1,281 @@
+"""Defines FixedPointEngine: PricingEngine computing base price and
+commission with integers only, identical to the float rent.Rental path.
+
+Rounding: discount tiers are tenths of day price (10, 9, 7 then 5 tenths a
+day) and config rates are exact decimal fractions of their json value, so
+with integer prices every amount is an integer numerator over an integer
+denominator, rounded half to even as Python round().
+Float evaluation only departs from these exact decimals by its
+representation errors, a few units of 2 ** -53 of the operands. Amounts
+farther than ERROR_BITS of the operands magnitude from a half cent are
+rounded the same by both. Amounts closer to a half cent (e.g. 30% of a
+price ending with 5 cents) and amounts of other json numbers (e.g. 2000.5)
+are rounded as float evaluation does: the same operations on binary
+coefficients, each result rounded to a binary64 double with integers
+(to_double), integer operations staying exact as in Python.
+
+Exact mode (FixedPointEngine(exact=True)) rounds exact decimal amounts half
+to even instead, json numbers as their decimal fractions. Float
+coefficients are slightly off their decimal value, so amounts exactly on a
+half cent may be rounded away from even by floats: exact amounts differ by
+one cent on these ties only. With default config exact amounts are one
+cent higher:
+- owner fee (70% of base price) of base prices ending with 5 cents: about
+  1% of base prices, e.g. 45 gives 32 instead of 31;
+- base price of even durations from 6 days (5.1, 7.9, 8.9... day prices)
+  on a half cent: about 0.3% of generated rentals, price and commissions
+  of these rentals follow.
+Insurance, assistance and drivy fees of a given base price are identical.
+"""
+from fractions import Fraction
+
+from pricing import DISCOUNT_DAYS, DISCOUNT_TABLE, DISCOUNT_TAIL, \
+    compute_base_price, compute_commission
+from engine import PricingEngine
+
+# Day price tenths of discount tiers: (last day of tier, tenths)
+DISCOUNT_TIERS = ((1, 10), (4, 9), (10, 7), (None, 5))
+# Float evaluation error bound: 2 ** -ERROR_BITS of operands magnitude
+ERROR_BITS = 48
+# binary64 significand bits
+SIGNIFICAND_BITS = 53
+
+
+def get_multiplier_tenths(duration):
+    """Return discount multiplier in tenths of day price."""
+    tenths = 0
+    first_day = 1
+    for last_day, day_tenths in DISCOUNT_TIERS:
+        days = duration if last_day is None else min(duration, last_day)
+        if days >= first_day:
+            tenths += (days - first_day + 1) * day_tenths
+        if last_day is not None:
+            first_day = last_day + 1
+    return tenths
+
+
+def get_decimal(value):
+    """Return exact fraction of json number: 0.3 is 3/10."""
+    if isinstance(value, int):
+        return Fraction(value)
+    return Fraction(repr(value))
+
+
+def to_double(value):
+    """Return fraction rounded to nearest binary64 double, ties to even, as
+    float operations round their exact result."""
+    if not value:
+        return Fraction(0)
+    numerator = abs(value.numerator)
+    denominator = value.denominator
+    # Scale so integer significand has SIGNIFICAND_BITS bits
+    shift = SIGNIFICAND_BITS - numerator.bit_length() + \
+        denominator.bit_length()
+    while True:
+        if shift >= 0:
+            significand, remainder = divmod(numerator << shift, denominator)
+            scaled_denominator = denominator
+        else:
+            scaled_denominator = denominator << -shift
+            significand, remainder = divmod(numerator, scaled_denominator)
+        if significand.bit_length() <= SIGNIFICAND_BITS:
+            break
+        shift -= 1
+
+    if 2 * remainder > scaled_denominator or \
+            (2 * remainder == scaled_denominator and significand % 2):
+        significand += 1
+    double = Fraction(significand, 1 << shift) if shift >= 0 \
+        else Fraction(significand << -shift)
+    return double if value > 0 else -double
+
+
+def get_binary(value):
+    """Return exact fraction of a float operation operand: integers are
+    converted to the nearest double, floats are exact."""
+    if isinstance(value, int):
+        return to_double(Fraction(value))
+    return Fraction(value)
+
+
+def float_multiply(left, right):
+    """Return left * right evaluated as Python does: exact integer product
+    of integers, else double as exact fraction. Operands are integers,
+    floats or doubles as exact fractions."""
+    if isinstance(left, int) and isinstance(right, int):
+        return left * right
+    return to_double(get_binary(left) * get_binary(right))
+
+
+def float_add(left, right):
+    """Return left + right evaluated as Python does, see
+    float_multiply()."""
+    if isinstance(left, int) and isinstance(right, int):
+        return left + right
+    return to_double(get_binary(left) + get_binary(right))
+
+
+def round_half_even(numerator, denominator):
+    """Return numerator / denominator integers rounded half to even, as
+    Python round()."""
+    quotient, remainder = divmod(numerator, denominator)
+    if 2 * remainder > denominator or \
+            (2 * remainder == denominator and quotient % 2):
+        quotient += 1
+    return quotient
+
+
+def round_scaled(terms, denominator, float_value):
+    """Return sum of integer terms over denominator rounded half to even.
+    Amounts close to a half are rounded as float_value(): function
+    returning float evaluation as an exact fraction."""
+    quotient, remainder = divmod(sum(terms), denominator)
+    magnitude = sum(abs(term) for term in terms) // denominator + 1
+    if abs(2 * remainder - denominator) << ERROR_BITS > \
+            2 * denominator * magnitude:
+        return quotient + (2 * remainder > denominator)
+    return round(float_value())
+
+
+class FixedPointEngine(PricingEngine):
+    """Class pricing rentals with integer arithmetic: same outputs as
+    PricingEngine, independent of platform float evaluation."""
+
+    def __init__(self, config=None, exact=False):
+        """Construct engine from cfg like dictionary, rent.cfg by default.
+        exact: round exact decimal amounts half to even rather than as
+        float evaluation, see documented differences."""
+        super().__init__(config)
+        self.exact = exact
+        config = self.config
+        commission_base = get_decimal(config.commission_base)
+        insurance_part = get_decimal(config.insurance_part)
+        assistance_fee = get_decimal(config.assistance_fee_per_day)
+
+        # Rates of base price and assistance fee per day as (numerator,
+        # denominator): owner, insurance, assistance and drivy fees
+        owner_rate = 1 - commission_base
+        insurance_rate = commission_base * insurance_part
+        drivy_rate = commission_base * (1 - insurance_part)
+        self.owner_rate = (owner_rate.numerator, owner_rate.denominator)
+        self.insurance_rate = (insurance_rate.numerator,
+                               insurance_rate.denominator)
+        self.assistance_rate = (assistance_fee.numerator,
+                                assistance_fee.denominator)
+        # Drivy fee: base price and assistance fee over one denominator
+        self.drivy_rate = (
+            drivy_rate.numerator * assistance_fee.denominator,
+            assistance_fee.numerator * drivy_rate.denominator,
+            drivy_rate.denominator * assistance_fee.denominator)
+
+        # Coefficients of float evaluation: integers, floats or exact
+        # fractions of doubles
+        self.binary = {
+            'commission_base': config.commission_base,
+            'owner_part': float_add(1, -config.commission_base),
+            'insurance_part': config.insurance_part,
+            'drivy_part': float_add(1, -config.insurance_part),
+            'assistance_fee_per_day': config.assistance_fee_per_day}
+
+    def get_pricing_stages(self):
+        """Return level 5 pricing stages, base price and commission stages
+        computed with integers."""
+        integer_stages = {compute_base_price: self.compute_base_price,
+                          compute_commission: self.compute_commission}
+        return tuple(integer_stages.get(stage, stage)
+                     for stage in super().get_pricing_stages())
+
+    def compute_base_price(self, rental, car):
+        """Base price stage: integer days and distance price."""
+        rental.base_price = self.get_rental_base_price(rental, car)
+
+    def compute_commission(self, rental, car):
+        """Commission stage: integer owner, insurance, assistance and drivy
+        fees."""
+        rental.commission = self.get_commission(
+            rental.base_price, rental.duration,
+            rental.options_price['owner_fee'],
+            rental.options_price['drivy_fee'])
+
+    def round(self, terms, denominator, float_value):
+        """Return sum of integer terms over denominator rounded half to
+        even, as round_scaled() unless exact."""
+        if self.exact:
+            return round_half_even(sum(terms), denominator)
+        return round_scaled(terms, denominator, float_value)
+
+    @staticmethod
+    def get_binary_multiplier(duration):
+        """Return discount multiplier as float evaluation: integer or
+        exact fraction."""
+        if duration <= DISCOUNT_DAYS:
+            return DISCOUNT_TABLE[max(duration, 0)]
+        return float_add(DISCOUNT_TABLE[DISCOUNT_DAYS], float_multiply(
+            duration - DISCOUNT_DAYS, DISCOUNT_TAIL))
+
+    def get_float_base_price(self, duration, distance, price_per_day,
+                             price_per_km):
+        """Return days and distance price as float evaluation."""
+        return float_add(
+            float_multiply(self.get_binary_multiplier(duration),
+                           price_per_day),
+            float_multiply(distance, price_per_km))
+
+    def get_base_price(self, duration, distance, price_per_day,
+                       price_per_km):
+        """Return days and distance price, excluding options."""
+        tenths = get_multiplier_tenths(duration)
+        if type(price_per_day) is int and type(distance) is int and \
+                type(price_per_km) is int:
+            return self.round(
+                (tenths * price_per_day, 10 * distance * price_per_km), 10,
+                lambda: self.get_float_base_price(
+                    duration, distance, price_per_day, price_per_km))
+
+        if not self.exact:
+            return round(self.get_float_base_price(
+                duration, distance, price_per_day, price_per_km))
+        base_price = Fraction(tenths, 10) * get_decimal(price_per_day) + \
+            get_decimal(distance) * get_decimal(price_per_km)
+        return round_half_even(base_price.numerator, base_price.denominator)
+
+    def get_commission(self, base_price, duration, owner_options,
+                       drivy_options):
+        """Return commission dict of base price, duration and options day
+        prices."""
+        binary = self.binary
+
+        def get_assistance_fee():
+            """Return assistance fee as float evaluation."""
+            return float_multiply(duration, binary['assistance_fee_per_day'])
+
+        def get_commission_part(part):
+            """Return commission part of base price as float evaluation."""
+            return float_multiply(
+                float_multiply(base_price, binary['commission_base']),
+                binary[part])
+
+        numerator, denominator = self.owner_rate
+        owner_fee = self.round(
+            (base_price * numerator,), denominator,
+            lambda: float_multiply(base_price, binary['owner_part']))
+        numerator, denominator = self.insurance_rate
+        insurance_fee = self.round(
+            (base_price * numerator,), denominator,
+            lambda: get_commission_part('insurance_part'))
+        numerator, denominator = self.assistance_rate
+        assistance_fee = self.round(
+            (duration * numerator,), denominator, get_assistance_fee)
+        base_numerator, assistance_numerator, denominator = self.drivy_rate
+        drivy_fee = self.round(
+            (base_price * base_numerator, -duration * assistance_numerator),
+            denominator,
+            lambda: float_add(get_commission_part('drivy_part'),
+                              -get_assistance_fee()))
+
+        return {
+            'owner_fee': owner_fee + owner_options * duration,
+            'insurance_fee': insurance_fee,
+            'assistance_fee': assistance_fee,
+            'drivy_fee': drivy_fee + drivy_options * duration
+        }
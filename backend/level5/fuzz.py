@@ -0,0 +1,396 @@
+"""Differential fuzz harness: prices generated inputs with the reference
+and every engine of ENGINES, reports the first divergences with minimized
+repro inputs.
+Reference is independent of the shared pricing core: outputs of frozen
+baseline.load_hook, plus repeated ids and double-booked cars entries
+(added since) found by brute force. Projections are compared to the
+reference rentals projected fields.
+Inputs cover boundary durations 1/4/10/11, zero distance, negative and
+decimal prices, missing cars, unknown options, dangling option
+rental_ids, duplicate car and rental ids and double-booked cars.
+Run: python fuzz.py [cases] [seed] [workers]"""
+
+import io
+import os
+import sys
+import json
+import random
+import tempfile
+import contextlib
+from functools import partial
+from datetime import date, datetime, timedelta
+from multiprocessing import Pool
+
+import rent
+import baseline
+from pricing import NegativePrice, OptionNotFound
+from engine import PricingEngine, PricedRental, input_hook
+from ratecard import RateCards
+from fixedpoint import FixedPointEngine
+from config import load_engine
+from serializer import dump_rentals
+from sweep import ConfigSweep
+from checkpoint import process_write_resumable
+from main import get_file_path
+
+BOUNDARY_DURATIONS = (1, 4, 10, 11)
+OPTIONS = tuple(rent.cfg['options_prices']) + ("unknown",)
+# Compared projections fields
+PROJECTIONS = (("price",), ("options",), ("price", "options", "actions"))
+
+
+def dumps_output(output):
+    """Return compact output dictionary json: C encoder, much faster than
+    indented output."""
+    return json.dumps(output, separators=(",", ":")).encode()
+
+
+def get_dropped(items, name):
+    """Return repeated ids entries of items dropped by last-wins policy:
+    every item but the last of its id."""
+    last_indexes = {item.get('id'): index for index, item in enumerate(items)}
+    return [{'%s_id' % name: item.get('id'), 'index': index}
+            for index, item in enumerate(items)
+            if last_indexes[item.get('id')] != index]
+
+
+def get_overlaps(rentals):
+    """Return double-booked cars entries by brute force: a rental starting
+    before the end of an earlier rental of its car (by start day, end day
+    then position) overlaps the first of them ending last."""
+    intervals = []
+    for position, rental in enumerate(rentals):
+        start_date = datetime.strptime(rental['start_date'], '%Y-%m-%d')
+        end_date = datetime.strptime(rental['end_date'], '%Y-%m-%d')
+        if end_date >= start_date:
+            intervals.append((start_date, end_date, position, rental))
+
+    overlaps = []
+    car_ids = list(dict.fromkeys(interval[3]['car_id']
+                                 for interval in intervals))
+    for car_id in car_ids:
+        car_intervals = sorted(interval for interval in intervals
+                               if interval[3]['car_id'] == car_id)
+        for index, (start_date, _, _, rental) in enumerate(car_intervals):
+            earlier = car_intervals[:index]
+            last_end = max((interval[1] for interval in earlier),
+                           default=None)
+            if last_end is not None and start_date <= last_end:
+                overlapping = next(interval[3] for interval in earlier
+                                   if interval[1] == last_end)
+                overlaps.append({'car_id': car_id,
+                                 'rental_id': rental['id'],
+                                 'overlapping_rental_id': overlapping['id']})
+    return overlaps
+
+
+def get_reference_output(input_json):
+    """Return reference level5 output dictionary."""
+    input_data = json.loads(input_json)
+    output = json.loads(input_json, object_hook=baseline.load_hook)
+    result = {'rentals': output.pop('rentals')}
+    for name, items in (('car', input_data['cars']),
+                        ('rental', input_data['rentals'])):
+        dropped = get_dropped(items, name)
+        if dropped:
+            result['duplicate_%ss' % name] = dropped
+    result.update(output)
+    # Rentals selected from ID: first position, last rental
+    overlaps = get_overlaps(list({rental['id']: rental for rental in
+                                  input_data['rentals']}.values()))
+    if overlaps:
+        result['overlapping_rentals'] = overlaps
+    return result
+
+
+def reference(input_json):
+    """Return reference level5 output json."""
+    return dumps_output(get_reference_output(input_json))
+
+
+def projected_reference(fields, input_json):
+    """Return reference output json of projection fields: price is driver
+    debit. Options only projections parse no dates, double-booked cars
+    aren't reported."""
+    output = get_reference_output(input_json)
+    output['rentals'] = [{
+        'id': rental['id'],
+        **({'price': rental['actions'][0]['amount']}
+           if 'price' in fields else {}),
+        **({'options': rental['options']} if 'options' in fields else {}),
+        **({'actions': rental['actions']} if 'actions' in fields else {})}
+        for rental in output['rentals']]
+    if fields == ("options",):
+        output.pop('overlapping_rentals', None)
+    return dumps_output(output)
+
+
+def engine_output(input_json):
+    """Return PricingEngine output json."""
+    return dumps_output(PricingEngine().get_output(
+        json.loads(input_json, object_hook=input_hook)))
+
+
+def fixed_point_output(input_json):
+    """Return FixedPointEngine output json."""
+    return dumps_output(FixedPointEngine().get_output(
+        json.loads(input_json, object_hook=input_hook)))
+
+
+def config_file_output(input_json):
+    """Return output json priced with data/pricing.json config file."""
+    return dumps_output(CONFIG_FILE_ENGINE.get_output(
+        json.loads(input_json, object_hook=input_hook)))
+
+
+def serializer_output(input_json):
+    """Return compact streaming serializer output json."""
+    data = json.loads(input_json, object_hook=input_hook)
+    write_file = io.BytesIO()
+    dump_rentals(*rent.price_rentals(data), write_file, compact=True)
+    return write_file.getvalue()
+
+
+def projection_output(fields, input_json):
+    """Return projection fields output json."""
+    return dumps_output(json.loads(input_json,
+                                   object_hook=rent.get_load_hook(fields)))
+
+
+def quote_output(input_json):
+    """Return output json of RateCards quotes of engine selected rentals,
+    unpriced rentals on quote errors as pipeline."""
+    cars, rentals, errors = PricingEngine().prepare_rentals(
+        json.loads(input_json, object_hook=input_hook))
+    rate_cards = RateCards(cars.values())
+    priced_rentals = []
+    for rental in rentals:
+        priced = PricedRental.from_rental(rental)
+        try:
+            quote = rate_cards.quote(rental.car_id, rental.start_date,
+                                     rental.end_date, rental.distance,
+                                     rental.options)
+        except (KeyError, NegativePrice, OptionNotFound):
+            pass
+        else:
+            priced = priced._replace(price=quote.price,
+                                     commission=quote.commission)
+        priced_rentals.append(priced)
+    output = {'rentals': [priced.get_dict() for priced in priced_rentals]}
+    output.update(errors)
+    return dumps_output(output)
+
+
+def sweep_output(input_json):
+    """Return rentals output json of a rent.cfg only sweep."""
+    results, errors = ConfigSweep({'cfg': rent.cfg}).sweep(
+        json.loads(input_json, object_hook=input_hook), rental_outputs=True)
+    output = {'rentals': results[0]['rentals']}
+    output.update(errors)
+    return dumps_output(output)
+
+
+def resumable_output(input_json):
+    """Return compact resumable run output json, committing a checkpoint
+    every 2 rentals."""
+    with tempfile.TemporaryDirectory() as directory:
+        input_path = os.path.join(directory, "input.json")
+        output_path = os.path.join(directory, "output.json")
+        with open(input_path, "w") as write_file:
+            write_file.write(input_json)
+        process_write_resumable(input_path, output_path, commit_every=2,
+                                compact=True)
+        with open(output_path, "rb") as read_file:
+            return read_file.read().rstrip(b"\n")
+
+
+CONFIG_FILE_ENGINE = load_engine(get_file_path("data/pricing.json"))
+
+
+# Engines compared to reference: {name: function(input json) -> bytes}
+ENGINES = {
+    'engine': engine_output,
+    'fixed_point': fixed_point_output,
+    'config_file': config_file_output,
+    'serializer': serializer_output,
+    'quote': quote_output,
+    'sweep': sweep_output,
+    'resumable': resumable_output,
+}
+# Engines compared to another reference: {name: function(input json)}
+REFERENCES = {}
+for FIELDS in PROJECTIONS:
+    ENGINES['projection_' + "_".join(FIELDS)] = partial(projection_output,
+                                                        FIELDS)
+    REFERENCES['projection_' + "_".join(FIELDS)] = partial(
+        projected_reference, FIELDS)
+
+
+def generate_input(generator, max_rentals=8):
+    """Return generated input dictionary."""
+    def price(maximum):
+        """Return price component: mostly positive, sometimes 0, negative
+        or with cents decimals."""
+        draw = generator.random()
+        if draw < 0.05:
+            return -generator.randint(1, maximum)
+        if draw < 0.15:
+            return 0
+        if draw < 0.25:
+            return generator.randint(1, maximum * 100) / 100
+        return generator.randint(1, maximum)
+
+    cars_count = generator.randint(0, 4)
+    cars = [{'id': car_id, 'price_per_day': price(10000),
+             'price_per_km': price(50)}
+            for car_id in range(1, cars_count + 1)]
+    # Duplicate car ids sometimes
+    for car in cars:
+        if generator.random() < 0.05:
+            car['id'] = generator.randint(1, car['id'])
+
+    rentals = []
+    rentals_count = generator.randint(0, max_rentals)
+    for rental_id in range(1, rentals_count + 1):
+        draw = generator.random()
+        if draw < 0.5:
+            duration = generator.choice(BOUNDARY_DURATIONS)
+        elif draw < 0.55:
+            duration = generator.randint(-1, 0)
+        else:
+            duration = generator.randint(1, 60)
+        start_date = date(2015, 1, 1) + timedelta(
+            days=generator.randrange(60))
+        end_date = start_date + timedelta(days=duration - 1)
+        rentals.append({
+            # Duplicate rental ids sometimes
+            'id': rental_id if generator.random() > 0.05
+                  else generator.randint(1, rental_id),
+            # Missing car ids sometimes
+            'car_id': generator.randint(1, cars_count + 1),
+            # Dates with or without zero padding
+            'start_date': "%d-%d-%d" % (start_date.year, start_date.month,
+                                        start_date.day)
+                          if generator.random() < 0.5
+                          else start_date.isoformat(),
+            'end_date': end_date.isoformat(),
+            'distance': 0 if generator.random() < 0.2 else price(3000)})
+
+    options = [{'id': option_id,
+                # Dangling rental ids sometimes
+                'rental_id': generator.randint(1, rentals_count + 1),
+                'type': generator.choice(OPTIONS)
+                        if generator.random() < 0.1
+                        else generator.choice(OPTIONS[:-1])}
+               for option_id in range(1, generator.randint(0, 6) + 1)]
+
+    return {'cars': cars, 'rentals': rentals, 'options': options}
+
+
+def run(function, input_json):
+    """Return function output, exception message if it raises."""
+    # Silence priced rentals errors printed on backend
+    with contextlib.redirect_stdout(io.StringIO()):
+        try:
+            return function(input_json)
+        except Exception as error:
+            return repr(error).encode()
+
+
+def diverges(name, input_data):
+    """Return True if engine name output differs from its reference
+    output."""
+    input_json = json.dumps(input_data)
+    return run(REFERENCES.get(name, reference), input_json) != \
+        run(ENGINES[name], input_json)
+
+
+def minimize(name, input_data):
+    """Return smallest input found by removing cars, rentals and options
+    one by one while engine name still diverges."""
+    input_data = {key: list(value) for key, value in input_data.items()}
+    reduced = True
+    while reduced:
+        reduced = False
+        for key in ('options', 'rentals', 'cars'):
+            index = 0
+            while index < len(input_data[key]):
+                candidate = dict(input_data)
+                candidate[key] = input_data[key][:index] + \
+                    input_data[key][index + 1:]
+                if diverges(name, candidate):
+                    input_data = candidate
+                    reduced = True
+                else:
+                    index += 1
+    return input_data
+
+
+def get_first_difference(expected, output):
+    """Return first diverging rental id, or None if not found."""
+    try:
+        expected_rentals = json.loads(expected)['rentals']
+        rentals = json.loads(output)['rentals']
+    except (ValueError, KeyError, TypeError):
+        return None
+    for expected_rental, rental in zip(expected_rentals, rentals):
+        if expected_rental != rental:
+            return expected_rental.get('id')
+    return None
+
+
+def check_case(seed):
+    """Fuzz one case. Return divergences list: engine name, rental id,
+    minimized input, expected and engine outputs."""
+    input_data = generate_input(random.Random(seed))
+    input_json = json.dumps(input_data)
+    expected = run(reference, input_json)
+    divergences = []
+    for name, function in ENGINES.items():
+        engine_reference = REFERENCES.get(name, reference)
+        if run(function, input_json) == (
+                expected if engine_reference is reference
+                else run(engine_reference, input_json)):
+            continue
+        minimized = minimize(name, input_data)
+        minimized_json = json.dumps(minimized)
+        minimized_expected = run(engine_reference, minimized_json)
+        output = run(function, minimized_json)
+        divergences.append({
+            'seed': seed,
+            'engine': name,
+            'rental_id': get_first_difference(minimized_expected, output),
+            'input': minimized,
+            'expected': minimized_expected.decode(),
+            'output': output.decode()})
+    return divergences
+
+
+def fuzz(cases, seed=0, workers=1, max_divergences=10):
+    """Fuzz cases inputs from seed with workers processes.
+    Return up to max_divergences divergences."""
+    divergences = []
+    seeds = range(seed, seed + cases)
+    if workers > 1:
+        with Pool(workers) as pool:
+            results = pool.imap_unordered(check_case, seeds, chunksize=1000)
+            for result in results:
+                divergences.extend(result)
+                if len(divergences) >= max_divergences:
+                    pool.terminate()
+                    break
+    else:
+        for case_seed in seeds:
+            divergences.extend(check_case(case_seed))
+            if len(divergences) >= max_divergences:
+                break
+    return divergences[:max_divergences]
+
+
+if __name__ == "__main__":
+    ARGS = [int(arg) for arg in sys.argv[1:4]]
+    DIVERGENCES = fuzz(*ARGS) if ARGS else fuzz(10000)
+    for divergence in DIVERGENCES:
+        print(json.dumps(divergence, indent=2))
+    print("%d divergences" % len(DIVERGENCES))
+    sys.exit(1 if DIVERGENCES else 0)
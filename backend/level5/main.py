@@ -4,23 +4,129 @@ by rent module."""
 import sys
 import os
 import json
-from rent import load_hook
+from rent import pipeline
+from serializer import dump_rentals
+from engine import input_hook
+from config import load_engine
+from settlement import SettlementTotals
+from checkpoint import process_write_resumable
+from analytics import PriceAnalytics
+from partition import write_partitions
 
 def get_file_path(relative_path):
     """Get file path from argument and current path"""
     return os.path.join(os.path.dirname(__file__), relative_path)
 
-def process_write_data(input_path, output_path):
-    """Open input json, process data with load_hook and write output json"""
+def price_input(input_path, config_path=None, stages=(), fields=None,
+                duplicates=None, dates=False):
+    """Open input json and return priced rentals and errors.
+    config_path: price with config json file instead of rent.cfg.
+    stages: objects with add(rental) method fed with every priced rental.
+    fields: only compute projection fields (price, options, actions).
+    duplicates: repeated ids policy (reject, first-wins or last-wins),
+    rent.pipeline policy by default.
+    dates: projected rentals dates are needed, e.g. month partitions."""
+    if duplicates is None:
+        duplicates = pipeline.duplicates
+    if config_path is None:
+        rent_pipeline = pipeline.with_duplicates(duplicates)
+        if fields is not None:
+            # Stages need priced rentals: every pricing stage runs
+            rent_pipeline = rent_pipeline.project(fields, bool(stages),
+                                                  dates)
+        with open(get_file_path(input_path)) as read_file:
+            data = json.load(read_file,
+                             object_hook=rent_pipeline.rental_hook)
+        return rent_pipeline.price_rentals(data, stages)
+
+    if fields is not None:
+        raise ValueError("Projection fields are computed with rent.cfg only")
     with open(get_file_path(input_path)) as read_file:
-        actions_output = json.load(read_file, object_hook=load_hook)
+        data = json.load(read_file, object_hook=input_hook)
+    return load_engine(get_file_path(config_path)).price_rentals(
+        data, stages, duplicates)
+
+def process_write_data(input_path, output_path, streaming=False,
+                       compact=False, config_path=None, settlement_path=None,
+                       commit_every=None, summary_path=None, fields=None,
+                       duplicates=None, partition_key=None, partitions=16):
+    """Open input json, compute rentals costs and write output json.
+    streaming: write rentals straight to output file with serializer module,
+    always done for projections.
+    compact: streaming output without indentation and spaces.
+    config_path: price with config json file instead of rent.cfg.
+    settlement_path: also write per actor, car and day totals report.
+    summary_path: also write price distribution summary (analytics module).
+    commit_every: resumable streaming run committing a checkpoint every
+    commit_every rentals (checkpoint module), priced with rent.cfg to a
+    single output file without reports.
+    fields: output only these fields of rentals (price, options, actions),
+    computations not needed by them are skipped.
+    duplicates: repeated cars and rentals ids policy (reject, first-wins or
+    last-wins), reported in output errors.
+    partition_key: write output_path directory of rentals files partitioned
+    by car (partitions car id hashes) or month, and their manifest
+    (partition module)."""
+    if commit_every is not None:
+        # Reports of resumed runs would miss rentals priced before crash
+        unsupported = [name for name, value in (
+            ('config_path', config_path),
+            ('settlement_path', settlement_path),
+            ('summary_path', summary_path), ('fields', fields),
+            ('partition_key', partition_key)) if value is not None]
+        if unsupported:
+            raise ValueError("Resumable runs don't support %s" %
+                             ", ".join(unsupported))
+        process_write_resumable(get_file_path(input_path),
+                                get_file_path(output_path),
+                                commit_every=commit_every, compact=compact,
+                                duplicates=duplicates)
+        return
+
+    stages = []
+    if settlement_path is not None:
+        settlement = SettlementTotals()
+        stages.append(settlement)
+    if summary_path is not None:
+        analytics = PriceAnalytics()
+        stages.append(analytics)
+
+    rentals, errors = price_input(input_path, config_path, stages, fields,
+                                  duplicates, partition_key == 'month')
+
+    if settlement_path is not None:
+        with open(get_file_path(settlement_path), "w") as write_file:
+            settlement.dump(write_file)
+    if summary_path is not None:
+        with open(get_file_path(summary_path), "w") as write_file:
+            analytics.dump(write_file)
+
+    if partition_key is not None:
+        write_partitions(rentals, errors, get_file_path(output_path),
+                         partition_key, partitions, compact,
+                         projected=fields is not None)
+        return
+
+    if streaming or compact or fields is not None:
+        # Projections are streamed too: same bytes as json.dump, without
+        # its slow indented encoder
+        with open(get_file_path(output_path), "wb") as write_file:
+            dump_rentals(rentals, errors, write_file, compact,
+                         projected=fields is not None)
+            write_file.write(b"\n")
+        return
+
+    actions_output = {'rentals': [rental.get_dict() for rental in rentals]}
+    actions_output.update(errors)
 
     with open(get_file_path(output_path), "w") as write_file:
         json.dump(actions_output, write_file, indent=2)
         write_file.write("\n")
 
 if __name__ == "__main__":
-    if len(sys.argv) == 3:
+    if len(sys.argv) == 4:
+        process_write_data(sys.argv[1], sys.argv[2], config_path=sys.argv[3])
+    elif len(sys.argv) == 3:
         process_write_data(sys.argv[1], sys.argv[2])
     else:
         process_write_data("data/input.json", "data/output.json")
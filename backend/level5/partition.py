@@ -0,0 +1,101 @@
+"""Partitioned output: priced rentals are split by a partition key (car id
+hash or start date month), each partition is streamed to its own json file
+by parallel writer threads, and a manifest lists partitions files, rentals
+counts and sha256 checksums so readers can load shards independently.
+"""
+import os
+import json
+import hashlib
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+from serializer import RentalWriter
+
+MANIFEST_NAME = "manifest.json"
+
+
+def get_car_partition(rental, partitions):
+    """Return car partition name: car id hash modulo partitions count.
+    crc32 is stable across runs, unlike hash() of strings."""
+    return "car-%03d" % (zlib.crc32(str(rental.car_id).encode())
+                         % partitions)
+
+
+def get_month_partition(rental, partitions):
+    """Return start date month partition name."""
+    return rental.start_date.strftime("month-%Y-%m")
+
+
+# Partition keys: {name: function(rental, partitions count) -> partition}
+PARTITION_KEYS = {
+    'car': get_car_partition,
+    'month': get_month_partition,
+}
+
+
+class ChecksumFile:
+    """Class forwarding writes to a binary file object and hashing them."""
+
+    def __init__(self, write_file):
+        """Construct from binary file object."""
+        self.write_file = write_file
+        self.hash = hashlib.sha256()
+
+    def write(self, data):
+        """Hash and write bytes."""
+        self.hash.update(data)
+        return self.write_file.write(data)
+
+
+def write_partition(directory, partition, rentals, compact=False,
+                    projected=False):
+    """Write partition rentals json file. Return its manifest entry."""
+    path = "rentals-%s.json" % partition
+    with open(os.path.join(directory, path), "wb") as write_file:
+        checksum_file = ChecksumFile(write_file)
+        writer = RentalWriter(checksum_file, compact, projected=projected)
+        for rental in rentals:
+            writer.write_rental(rental)
+        writer.close({})
+        checksum_file.write(b"\n")
+
+    return {'partition': partition, 'path': path, 'rentals': len(rentals),
+            'sha256': checksum_file.hash.hexdigest()}
+
+
+def write_partitions(rentals, errors, directory, key='car', partitions=16,
+                     compact=False, projected=False, workers=4):
+    """Write priced rentals partitioned by key (car or month) to directory,
+    one file per partition written by workers threads, and manifest.
+    partitions: car id hash partitions count.
+    Return manifest dictionary, errors are added to it."""
+    get_partition = PARTITION_KEYS[key]
+    groups = {}
+    for rental in rentals:
+        groups.setdefault(get_partition(rental, partitions), []).append(
+            rental)
+
+    os.makedirs(directory, exist_ok=True)
+    with ThreadPoolExecutor(workers) as executor:
+        entries = list(executor.map(
+            lambda partition: write_partition(
+                directory, partition, groups[partition], compact, projected),
+            sorted(groups)))
+
+    manifest = {'key': key, 'partitions': entries}
+    manifest.update(errors)
+    with open(os.path.join(directory, MANIFEST_NAME), "w") as write_file:
+        json.dump(manifest, write_file, indent=2)
+        write_file.write("\n")
+    return manifest
+
+
+def load_partition(directory, entry):
+    """Load partition json file of a manifest entry after checking its
+    checksum. Raise ValueError if file doesn't match manifest."""
+    with open(os.path.join(directory, entry['path']), "rb") as read_file:
+        data = read_file.read()
+    if hashlib.sha256(data).hexdigest() != entry['sha256']:
+        raise ValueError("Partition %s checksum mismatch" %
+                         entry['partition'])
+    return json.loads(data)
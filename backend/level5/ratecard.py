@@ -0,0 +1,77 @@
+"""Defines RateCards: day price of each car precomputed for durations up to
+CARD_DAYS, so quoting the same car for many durations and distances costs a
+table lookup and one multiply-add. Quotes are identical to rent.Rental
+prices and commissions.
+Defines Quote: quoted price and commission value object.
+"""
+from array import array
+from collections import namedtuple
+from datetime import datetime
+
+from pricing import check_prices, get_table_multiplier
+from engine import PricingEngine, PricedRental
+
+# Durations with precomputed day price, longer ones use discount closed form
+CARD_DAYS = 31
+
+
+class Quote(namedtuple('Quote', ['duration', 'price', 'commission'])):
+    """Quote value object: same price, commission and actions as a priced
+    Rental."""
+    __slots__ = ()
+
+    get_actions = PricedRental.get_actions
+
+
+def get_date(value):
+    """Return datetime from input json date string, dates are returned."""
+    if isinstance(value, str):
+        return datetime.strptime(value, '%Y-%m-%d')
+    return value
+
+
+class RateCards:
+    """Class quoting cars of a catalog: day price by duration of each car
+    in a compact float array, computed as rent.Rental does."""
+
+    def __init__(self, cars, config=None, days=CARD_DAYS):
+        """Construct rate cards of cars list (input json cars).
+        config: cfg like dictionary, rent.cfg by default."""
+        self.engine = PricingEngine(config)
+        self.days = days
+        # {car_id: (day prices by duration, price_per_day, price_per_km)}
+        self.cards = {}
+        for car in cars:
+            price_per_day = car.get('price_per_day', 0)
+            # Index 0 is unused: durations start at 1
+            day_prices = array('d', (
+                get_table_multiplier(duration) * price_per_day
+                for duration in range(days + 1)))
+            self.cards[car.get('id')] = (day_prices, price_per_day,
+                                         car.get('price_per_km', 0))
+
+    def get_base_price(self, car_id, duration, distance):
+        """Return base price of car for duration and distance.
+        Raise KeyError if car is missing, NegativePrice as rent.Rental."""
+        day_prices, price_per_day, price_per_km = self.cards[car_id]
+        check_prices(duration, distance, price_per_day, price_per_km)
+
+        if duration <= self.days:
+            day_price = day_prices[duration]
+        else:
+            day_price = get_table_multiplier(duration) * price_per_day
+        return int(round(day_price + distance * price_per_km))
+
+    def quote(self, car_id, start_date, end_date, distance, options=()):
+        """Return Quote of car from start_date to end_date (input json date
+        strings, dates or datetimes) with options list (input json options
+        dicts)."""
+        duration = (get_date(end_date) - get_date(start_date)).days + 1
+        base_price = self.get_base_price(car_id, duration, distance)
+        owner_options, drivy_options = \
+            self.engine.get_options_prices(options)
+        return Quote(
+            duration,
+            base_price + (owner_options + drivy_options) * duration,
+            self.engine.get_commission(base_price, duration, owner_options,
+                                       drivy_options))
@@ -0,0 +1,167 @@
+"""Defines RentalWriter: writes priced rentals straight to a binary output
+buffer, byte-identical to json.dump(indent=2) of load_hook output.
+Defines rentals_hook that takes input json and output priced Rental objects.
+"""
+import json
+from json.encoder import encode_basestring_ascii
+
+from rent import ACTORS, load_hook, price_rentals
+
+# Output fields of rentals that aren't projected
+RENTAL_FIELDS = ('options', 'actions')
+
+
+def rentals_hook(dct):
+    """Hook called when loading json: return priced rentals and errors
+    instead of output dictionary."""
+    if "cars" in dct:
+        return price_rentals(dct)
+
+    return load_hook(dct)
+
+
+def encode_value(value):
+    """Return json encoded scalar value as bytes."""
+    # bool is an int subclass but is encoded as true/false
+    if isinstance(value, int) and not isinstance(value, bool):
+        return b"%d" % value
+    if isinstance(value, str):
+        return encode_basestring_ascii(value).encode()
+    return json.dumps(value).encode()
+
+
+def escape(literal):
+    """Escape bytes literal to be used in a %-format template."""
+    return literal.replace(b"%", b"%%")
+
+
+class RentalWriter:
+    """Class writing priced rentals to a binary file object one by one.
+    Fixed strings are pre-encoded in byte templates: a rental only costs
+    one template formatting and one write."""
+
+    def __init__(self, write_file, compact=False, count=0, projected=False):
+        """Construct writer and write output header.
+        count: rentals already written to file, to resume writing without
+        header.
+        projected: rentals output only their projection fields (Rental
+        fields)."""
+        self.write = write_file.write
+        self.count = count
+        self.projected = projected
+        self.compact = compact
+        self.colon = b":" if compact else b": "
+        # New line and indentation for each rental nesting level
+        self.newlines = [self.newline(level) for level in range(6)]
+
+        newline = self.newlines
+        self.rental_open = b"{" + newline[3] + b'"id"' + self.colon
+        self.price_key = b"," + newline[3] + b'"price"' + self.colon
+        self.options_key = b"," + newline[3] + b'"options"' + self.colon
+        self.actions_key = b"," + newline[3] + b'"actions"' + self.colon
+        self.rental_close = newline[2] + b"}"
+
+        # Cache of encoded options and actions templates
+        self.options = {}
+        self.actions = {}
+
+        if not count:
+            self.write(b"{" + newline[1] + b'"rentals"' + self.colon + b"[")
+
+    def newline(self, level):
+        """Return new line and indentation for nesting level."""
+        return b"" if self.compact else b"\n" + b"  " * level
+
+    def get_actions_template(self, keys):
+        """Return actions template for commission keys, amounts as %d."""
+        try:
+            return self.actions[keys]
+        except KeyError:
+            pass
+
+        newline = self.newlines
+        actions = [("driver", "debit")]
+        actions.extend((ACTORS[key], "credit") for key in keys)
+        template = b"[" + newline[4] + (b"," + newline[4]).join(
+            b"{" + newline[5]
+            + b'"who"' + self.colon + escape(encode_value(who))
+            + b"," + newline[5]
+            + b'"type"' + self.colon + encode_value(kind)
+            + b"," + newline[5]
+            + b'"amount"' + self.colon + b"%d"
+            + newline[4] + b"}"
+            for who, kind in actions) + newline[3] + b"]"
+
+        self.actions[keys] = template
+        return template
+
+    def encode_options(self, options):
+        """Return encoded options names list."""
+        if not options:
+            return b"[]"
+
+        encoded = []
+        for option in options:
+            name = option['type']
+            try:
+                encoded.append(self.options[name])
+            except KeyError:
+                encoded.append(self.options.setdefault(
+                    name, encode_value(name)))
+        newline = self.newlines
+        return b"[" + newline[4] + (b"," + newline[4]).join(encoded) \
+            + newline[3] + b"]"
+
+    def write_rental(self, rental):
+        """Write rental output dictionary: projection fields of projected
+        rentals."""
+        parts = [b"," + self.newlines[2] if self.count else self.newlines[2],
+                 self.rental_open, encode_value(rental.id)]
+        fields = rental.fields if self.projected else RENTAL_FIELDS
+        if 'price' in fields:
+            parts += (self.price_key, encode_value(rental.price))
+        if 'options' in fields:
+            parts += (self.options_key, self.encode_options(rental.options))
+        if 'actions' in fields:
+            commission = rental.commission
+            parts += (self.actions_key,
+                      self.get_actions_template(tuple(commission)) %
+                      (rental.price, *commission.values()))
+        parts.append(self.rental_close)
+
+        self.write(b"".join(parts))
+        self.count += 1
+
+    def encode(self, value, level):
+        """Return json encoded value with indentation of nesting level."""
+        inner = self.newline(level + 1)
+        if isinstance(value, dict):
+            if not value:
+                return b"{}"
+            return b"{" + inner + (b"," + inner).join(
+                encode_value(key) + self.colon + self.encode(item, level + 1)
+                for key, item in value.items()) + self.newline(level) + b"}"
+        if isinstance(value, list):
+            if not value:
+                return b"[]"
+            return b"[" + inner + (b"," + inner).join(
+                self.encode(item, level + 1)
+                for item in value) + self.newline(level) + b"]"
+        return encode_value(value)
+
+    def close(self, errors):
+        """Close rentals list, write errors and output footer."""
+        self.write(self.newlines[1] + b"]" if self.count else b"]")
+        for key, value in errors.items():
+            self.write(b"," + self.newlines[1] + encode_value(key)
+                       + self.colon + self.encode(value, 1))
+        self.write(self.newlines[0] + b"}")
+
+
+def dump_rentals(rentals, errors, write_file, compact=False,
+                 projected=False):
+    """Write rentals and errors to binary file object."""
+    writer = RentalWriter(write_file, compact, projected=projected)
+    for rental in rentals:
+        writer.write_rental(rental)
+    writer.close(errors)
@@ -0,0 +1,68 @@
+"""Defines SettlementTotals: pricing stage keeping running totals owed to
+each actor keyed by (actor, car_id, settlement date), mergeable across
+shards and workers.
+Rentals are settled on their end date.
+"""
+import json
+from datetime import date, datetime
+
+from rent import ACTORS
+
+
+class SettlementTotals:
+    """Class aggregating priced rentals commissions without building
+    actions lists."""
+
+    def __init__(self):
+        """Construct empty totals."""
+        # {(commission key, car_id, end date ordinal): amount}
+        self.totals = {}
+
+    def add(self, rental):
+        """Add priced rental commissions to totals."""
+        totals = self.totals
+        car_id = rental.car_id
+        end_day = rental.end_date.toordinal()
+        for key, amount in rental.commission.items():
+            total_key = (key, car_id, end_day)
+            totals[total_key] = totals.get(total_key, 0) + amount
+
+    def merge(self, other):
+        """Add totals of another SettlementTotals, e.g. from another shard.
+        Return self."""
+        totals = self.totals
+        for total_key, amount in other.totals.items():
+            totals[total_key] = totals.get(total_key, 0) + amount
+        return self
+
+    def get_report(self):
+        """Return settlement report dictionary: one row per car and day with
+        amount owed to each actor."""
+        rows = {}
+        for (key, car_id, end_day), amount in self.totals.items():
+            row = rows.get((car_id, end_day))
+            if row is None:
+                row = rows[(car_id, end_day)] = {
+                    'car_id': car_id,
+                    'date': date.fromordinal(end_day).isoformat()}
+            row[ACTORS[key]] = amount
+        return {'settlements': [rows[row_key] for row_key in sorted(rows)]}
+
+    @classmethod
+    def from_report(cls, report):
+        """Return SettlementTotals from a settlement report dictionary, to
+        merge reports written by other workers."""
+        totals = cls()
+        keys = {actor: key for key, actor in ACTORS.items()}
+        for row in report['settlements']:
+            end_day = datetime.strptime(row['date'], '%Y-%m-%d').toordinal()
+            for actor, key in keys.items():
+                if actor in row:
+                    totals.totals[(key, row['car_id'], end_day)] = \
+                        row[actor]
+        return totals
+
+    def dump(self, write_file):
+        """Write compact settlement report json to text file object."""
+        json.dump(self.get_report(), write_file, separators=(",", ":"))
+        write_file.write("\n")
@@ -0,0 +1,133 @@
+"""Defines ConfigSweep: prices input rentals under many pricing configs in
+a single pass. Input is parsed and checked once, base price only depends on
+rental and car so it is computed once per rental; each config only adds its
+options prices and commission.
+Emits per config totals owed by driver and to each actor, and optionally
+per config rentals outputs.
+Run: python sweep.py input.json configs.json output.json
+configs.json: {config name: cfg like dictionary}
+"""
+import sys
+import json
+
+from rent import ACTORS, NegativePrice, OptionNotFound
+from engine import PricingEngine, PricedRental, input_hook
+from config import ConfigError
+from pricing import LAST_WINS
+
+
+def load_sweep(path):
+    """Return ConfigSweep of configs json file."""
+    try:
+        with open(path) as read_file:
+            return ConfigSweep(json.load(read_file))
+    except (OSError, ValueError, KeyError, TypeError, AttributeError) \
+            as load_error:
+        raise ConfigError(path, load_error) from load_error
+
+
+class ConfigSweep:
+    """Class pricing rentals with every config of a sweep: one engine per
+    config, sharing rentals checks and base prices."""
+
+    def __init__(self, configs):
+        """Construct sweep from {config name: cfg like dictionary}."""
+        self.names = list(configs)
+        self.engines = [PricingEngine(config) for config in configs.values()]
+
+    def get_totals(self):
+        """Return empty totals dict: driver debit and actors credits."""
+        return dict.fromkeys(('driver',) + tuple(ACTORS.values()), 0)
+
+    def sweep(self, dct, rental_outputs=False, duplicates=LAST_WINS):
+        """Price every rental in main input dict loaded with input_hook with
+        every config.
+        rental_outputs: also return priced rentals of each config.
+        Return configs results list and errors dict to be added to
+        output. A result holds config name, priced and unpriced rentals
+        counts, totals and rentals output dictionaries if requested."""
+        engines = self.engines
+        cars, rentals, errors = engines[0].prepare_rentals(dct, duplicates)
+        results = [{'name': name, 'priced': 0, 'unpriced': 0,
+                    'totals': self.get_totals()}
+                   for name in self.names]
+        outputs = [[] for _ in engines]
+
+        for rental in rentals:
+            rental_options = rental.options
+            duration = rental.duration
+            try:
+                base_price = engines[0].get_rental_base_price(
+                    rental, cars[rental.car_id])
+            except KeyError:
+                print("Missing car id %d to compute rental id %d." %
+                      (rental.car_id, rental.id))
+                base_price = None
+            except NegativePrice:
+                print("Negative price component on rental id %d." % rental.id)
+                base_price = None
+
+            for engine, result, output in zip(engines, results, outputs):
+                price = None
+                if base_price is not None:
+                    try:
+                        owner_options, drivy_options = \
+                            engine.get_options_prices(rental_options)
+                    except OptionNotFound as error_msg:
+                        print("%s Config %s." % (error_msg, result['name']))
+                    else:
+                        price = base_price + \
+                            (owner_options + drivy_options) * duration
+                        commission = engine.get_commission(
+                            base_price, duration, owner_options,
+                            drivy_options)
+
+                if price is None:
+                    # Rental couldn't be priced: driver debit cost will be 0
+                    result['unpriced'] += 1
+                    price = 0
+                    commission = {}
+                else:
+                    result['priced'] += 1
+                    totals = result['totals']
+                    totals['driver'] += price
+                    for key, amount in commission.items():
+                        totals[ACTORS[key]] += amount
+
+                if rental_outputs:
+                    output.append(PricedRental(
+                        rental.id, rental.car_id, rental.start_date,
+                        rental.end_date, duration, rental_options, price,
+                        commission))
+
+        if rental_outputs:
+            for result, output in zip(results, outputs):
+                result['rentals'] = [priced.get_dict() for priced in output]
+        return results, errors
+
+    def get_output(self, dct, rental_outputs=False):
+        """Return sweep output dictionary for main input dict loaded with
+        input_hook: configs results and errors."""
+        results, errors = self.sweep(dct, rental_outputs)
+        output = {'configs': results}
+        output.update(errors)
+        return output
+
+
+def process_write_sweep(input_path, configs_path, output_path,
+                        rental_outputs=False):
+    """Open input json, price it with every config of configs json file and
+    write sweep output json."""
+    with open(input_path) as read_file:
+        data = json.load(read_file, object_hook=input_hook)
+    output = load_sweep(configs_path).get_output(data, rental_outputs)
+    with open(output_path, "w") as write_file:
+        json.dump(output, write_file, indent=2)
+        write_file.write("\n")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 4:
+        process_write_sweep(*sys.argv[1:])
+    else:
+        print(__doc__)
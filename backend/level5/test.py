@@ -2,9 +2,27 @@
 Run: pytest test.py (requires pytest module)"""
 
 import os
+import io
 import json
+import random
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from fractions import Fraction
+import pytest
 import rent
 import main
+import serializer
+import engine
+import config
+import settlement
+import analytics
+import fuzz
+import pricing
+import ratecard
+import fixedpoint
+import partition
+import sweep
+import benchmark
 
 def get_file(relative_path):
     """Get file path from parameter and current path."""
@@ -31,3 +49,636 @@ def test_files():
         expected_output = json.load(read_file)
 
     assert output == expected_output
+
+def test_streaming_files():
+    """Compare streaming serializer output bytes with json.dump output."""
+    main.process_write_data("data/input.json", "data/output.json")
+    with open(get_file("data/output.json"), "rb") as read_file:
+        output = read_file.read()
+
+    main.process_write_data("data/input.json", "data/output.json",
+                            streaming=True)
+    with open(get_file("data/output.json"), "rb") as read_file:
+        assert read_file.read() == output
+
+    main.process_write_data("data/input.json", "data/output.json",
+                            compact=True)
+    with open(get_file("data/output.json"), "rb") as read_file:
+        compact_output = read_file.read()
+
+    assert compact_output == json.dumps(
+        json.loads(output), separators=(",", ":")).encode() + b"\n"
+
+def test_streaming_errors():
+    """Compare serializer and json.dump output with missing car, rental,
+    options and no rentals."""
+    inputs = [
+        {"cars": [{"id": 1, "price_per_day": 2000, "price_per_km": 10}],
+         "rentals": [
+             {"id": 1, "car_id": 2, "start_date": "2015-12-8",
+              "end_date": "2015-12-8", "distance": 100},
+             {"id": 2, "car_id": 1, "start_date": "2015-12-8",
+              "end_date": "2015-12-9", "distance": 100}],
+         "options": [{"id": 1, "rental_id": 3, "type": "gps"}]},
+        {"cars": [], "rentals": [], "options": []}]
+
+    for input_data in inputs:
+        input_json = json.dumps(input_data)
+        expected_output = json.loads(input_json, object_hook=rent.load_hook)
+
+        for compact, kwargs in ((False, {"indent": 2}),
+                                (True, {"separators": (",", ":")})):
+            write_file = io.BytesIO()
+            serializer.dump_rentals(
+                *json.loads(input_json, object_hook=serializer.rentals_hook),
+                write_file, compact)
+            assert write_file.getvalue() == \
+                json.dumps(expected_output, **kwargs).encode()
+
+def test_engine():
+    """Compare PricingEngine output with expected output, and engines with
+    different configs running in threads with sequential runs."""
+    with open(get_file("data/input.json")) as read_file:
+        data = json.load(read_file, object_hook=engine.input_hook)
+
+    with open(get_file("data/expected_output.json")) as read_file:
+        expected_output = json.load(read_file)
+
+    assert engine.PricingEngine().get_output(data) == expected_output
+
+    engines = [engine.PricingEngine(dict(rent.cfg, commission_base=base))
+               for base in (0.1, 0.2, 0.3, 0.4)]
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        outputs = list(executor.map(lambda pricing: pricing.get_output(data),
+                                    engines))
+    assert outputs == [pricing.get_output(data) for pricing in engines]
+    assert outputs[2] == expected_output
+
+    # Engines price copies of input rentals with level 5 pricing stages
+    assert all(not rental.options and not rental.commission
+               for rental in data['rentals'])
+    assert engines[0].rental_class.pricing_stages == \
+        rent.Rental.pricing_stages
+
+def test_config_files():
+    """Compare output priced with config file and expected output."""
+    main.process_write_data("data/input.json", "data/output.json",
+                            config_path="data/pricing.json")
+
+    with open(get_file("data/output.json")) as read_file:
+        output = json.load(read_file)
+
+    with open(get_file("data/expected_output.json")) as read_file:
+        expected_output = json.load(read_file)
+
+    assert output == expected_output
+
+def test_config_watcher(tmp_path):
+    """Check watcher swaps engine on config change and keeps it on invalid
+    config."""
+    config_path = tmp_path / "pricing.json"
+    config_path.write_text(json.dumps(rent.cfg))
+    watcher = config.ConfigWatcher(str(config_path))
+    first_engine = watcher.engine
+    assert first_engine.config == engine.compile_config(rent.cfg)
+    assert not watcher.refresh()
+
+    config_path.write_text(json.dumps(dict(rent.cfg, commission_base=0.2)))
+    os.utime(config_path, ns=(0, 0))
+    assert watcher.refresh()
+    assert watcher.engine.config.commission_base == 0.2
+    assert first_engine.config.commission_base == 0.3
+
+    config_path.write_text("{")
+    assert not watcher.refresh()
+    assert watcher.engine.config.commission_base == 0.2
+
+def test_settlement(tmp_path):
+    """Compare settlement report with totals of expected output actions."""
+    settlement_path = str(tmp_path / "settlement.json")
+    main.process_write_data("data/input.json", str(tmp_path / "output.json"),
+                            settlement_path=settlement_path)
+
+    with open(settlement_path) as read_file:
+        report = json.load(read_file)
+
+    with open(get_file("data/input.json")) as read_file:
+        rentals = {rental['id']: rental
+                   for rental in json.load(read_file)['rentals']}
+    with open(get_file("data/expected_output.json")) as read_file:
+        expected_output = json.load(read_file)
+
+    expected_totals = {}
+    for rental in expected_output['rentals']:
+        end_date = datetime.strptime(rentals[rental['id']]['end_date'],
+                                          '%Y-%m-%d').date().isoformat()
+        for action in rental['actions']:
+            if action['type'] == 'credit':
+                key = (action['who'], rentals[rental['id']]['car_id'],
+                       end_date)
+                expected_totals[key] = expected_totals.get(key, 0) \
+                    + action['amount']
+
+    assert {(who, row['car_id'], row['date']): amount
+            for row in report['settlements']
+            for who, amount in row.items()
+            if who not in ('car_id', 'date')} == expected_totals
+
+    # Merging a report with itself doubles every total
+    totals = settlement.SettlementTotals.from_report(report)
+    doubled = totals.merge(settlement.SettlementTotals.from_report(report))
+    assert sum(row['owner'] for row in doubled.get_report()['settlements']) \
+        == 2 * sum(row['owner'] for row in report['settlements'])
+
+def test_rental_index(capsys):
+    """Check overlaps and active rentals queries against brute force."""
+    dates = ["2015-03-%02d" % day for day in range(1, 29)]
+    input_data = {
+        "cars": [{"id": 1, "price_per_day": 2000, "price_per_km": 10},
+                 {"id": 2, "price_per_day": 1000, "price_per_km": 5}],
+        "rentals": [{"id": index, "car_id": 1 + index % 2,
+                     "start_date": dates[(index * 7) % 20],
+                     "end_date": dates[(index * 7) % 20 + index % 8],
+                     "distance": 10}
+                    for index in range(1, 30)],
+        "options": []}
+    rentals = json.loads(json.dumps(input_data), object_hook=engine.input_hook)
+    index = rent.RentalIndex(rentals['rentals'])
+
+    overlapping = {(overlap['rental_id'], overlap['overlapping_rental_id'])
+                   for overlap in index.get_overlaps()}
+    for first in rentals['rentals']:
+        # Rental overlapping an earlier starting rental is flagged
+        overlaps = any(
+            second.car_id == first.car_id and second is not first and
+            (second.start_date, second.end_date, second.id) <
+            (first.start_date, first.end_date, first.id) and
+            second.end_date >= first.start_date
+            for second in rentals['rentals'])
+        assert overlaps == any(pair[0] == first.id for pair in overlapping)
+
+    for start in range(len(dates) - 3):
+        first_day = datetime.strptime(dates[start], '%Y-%m-%d')
+        last_day = datetime.strptime(dates[start + 3], '%Y-%m-%d')
+        for car_id in (None, 1, 2):
+            assert {rental.id for rental in index.get_active(
+                first_day, last_day, car_id)} == {
+                    rental.id for rental in rentals['rentals']
+                    if car_id in (None, rental.car_id) and
+                    rental.start_date <= last_day and
+                    rental.end_date >= first_day}
+
+    output = json.loads(json.dumps(input_data), object_hook=rent.load_hook)
+    assert len(output['overlapping_rentals']) == len(overlapping)
+
+    # Engine messages are returned instead of printed when requested
+    capsys.readouterr()
+    messages = []
+    priced, errors = engine.PricingEngine().price_rentals(
+        rentals, messages=messages)
+    assert capsys.readouterr().out == ""
+    assert len(messages) == len(overlapping)
+    assert len(errors['overlapping_rentals']) == len(overlapping)
+
+    # Benchmark input has no double-booked car
+    data = benchmark.generate_input(2000, cars_count=10)
+    assert rent.RentalIndex(data['rentals']).get_overlaps() == []
+
+def test_checkpoint(monkeypatch, tmp_path):
+    """Crash a resumable run after two rentals, resume it and compare with
+    expected output."""
+    output_path = str(tmp_path / "output.json")
+    main.process_write_data("data/input.json", output_path)
+    with open(output_path, "rb") as read_file:
+        expected_output = read_file.read()
+    os.remove(output_path)
+
+    compute_costs = rent.Rental.compute_costs
+    priced = []
+
+    def crash_costs(rental, car):
+        """Compute costs, crash on third rental."""
+        if len(priced) == 2:
+            raise RuntimeError("Crash")
+        compute_costs(rental, car)
+        priced.append(rental.id)
+
+    monkeypatch.setattr(rent.Rental, "compute_costs", crash_costs)
+    try:
+        main.process_write_data("data/input.json", output_path,
+                                commit_every=1)
+    except RuntimeError:
+        pass
+    monkeypatch.undo()
+
+    assert not os.path.exists(output_path)
+    with open(output_path + ".checkpoint") as read_file:
+        assert json.load(read_file)['rental_index'] == 2
+
+    main.process_write_data("data/input.json", output_path, commit_every=1)
+    assert not os.path.exists(output_path + ".checkpoint")
+    with open(output_path, "rb") as read_file:
+        assert read_file.read() == expected_output
+
+    # Options a resumed run can't honour are rejected
+    for options in ({'config_path': "data/pricing.json"},
+                    {'settlement_path': str(tmp_path / "settlement.json")},
+                    {'summary_path': str(tmp_path / "summary.json")},
+                    {'fields': ["price"]}, {'partition_key': "car"}):
+        with pytest.raises(ValueError):
+            main.process_write_data("data/input.json", output_path,
+                                    commit_every=1, **options)
+    for commit_every in (0, -1):
+        with pytest.raises(ValueError):
+            main.process_write_data("data/input.json", output_path,
+                                    commit_every=commit_every)
+    assert not os.path.exists(output_path + ".partial")
+
+def test_analytics(tmp_path):
+    """Compare sketch quantiles with exact quantiles, merged shards with
+    single sketch, and summary written with output."""
+    values = [(index * 7919) % 100000 - 5000 for index in range(10000)]
+    shards = [analytics.QuantileSketch() for _ in range(4)]
+    whole = analytics.QuantileSketch()
+    for index, value in enumerate(values):
+        shards[index % 4].add(value)
+        whole.add(value)
+    merged = shards[0].merge(shards[1]).merge(shards[2]).merge(shards[3])
+    assert merged.get_summary() == whole.get_summary()
+
+    values.sort()
+    for fraction in (0.5, 0.95, 0.99):
+        exact = values[int(fraction * (len(values) - 1))]
+        assert abs(merged.quantile(fraction) - exact) <= abs(exact) * 0.01
+
+    summary_path = str(tmp_path / "summary.json")
+    main.process_write_data("data/input.json", str(tmp_path / "output.json"),
+                            summary_path=summary_path)
+    with open(summary_path) as read_file:
+        summary = json.load(read_file)
+
+    assert summary['overall']['price']['count'] == 3
+    assert summary['overall']['price']['max'] == 27800
+    assert summary['overall']['duration']['p50'] == 2
+    assert summary['cars'][0]['car_id'] == 1
+
+def test_fuzz():
+    """Compare fuzz reference with expected output, and every engine with
+    reference on generated inputs."""
+    with open(get_file("data/input.json")) as read_file:
+        input_json = read_file.read()
+    with open(get_file("data/expected_output.json")) as read_file:
+        assert json.loads(fuzz.reference(input_json)) == json.load(read_file)
+
+    assert fuzz.fuzz(500) == []
+
+def test_golden_files(golden_files, compare_output, tmp_path):
+    """Compare output of golden input and golden expected output files."""
+    input_path, expected_path = golden_files
+    output_path = str(tmp_path / "output.json")
+    main.process_write_data(os.path.abspath(input_path), output_path)
+
+    compare_output(output_path, expected_path)
+
+def test_projection(tmp_path):
+    """Compare projected outputs with expected output fields."""
+    output_path = str(tmp_path / "output.json")
+    with open(get_file("data/expected_output.json")) as read_file:
+        expected_output = json.load(read_file)
+
+    for fields in (["price"], ["options"], ["actions", "options"],
+                   ["actions", "price"]):
+        with open(get_file("data/input.json")) as read_file:
+            output = json.load(read_file,
+                               object_hook=rent.get_load_hook(fields))
+        for rental, expected in zip(output['rentals'],
+                                    expected_output['rentals']):
+            assert rental == {
+                'id': expected['id'],
+                **({'price': expected['actions'][0]['amount']}
+                   if "price" in fields else {}),
+                **({'options': expected['options']}
+                   if "options" in fields else {}),
+                **({'actions': expected['actions']}
+                   if "actions" in fields else {})}
+
+        # Projections are streamed: same bytes as indented json.dump
+        main.process_write_data("data/input.json", output_path,
+                                fields=fields)
+        with open(output_path, "rb") as read_file:
+            assert read_file.read() == \
+                (json.dumps(output, indent=2) + "\n").encode()
+
+    # Price projection doesn't compute commission
+    projected = rent.Rental.project(["price"])
+    assert pricing.compute_commission not in projected.pricing_stages
+    assert rent.Rental.project(["options"]).pricing_stages == ()
+    # Double-booked cars are reported whenever dates are parsed
+    assert rent.pipeline.project(["price"]).overlaps
+    assert not rent.pipeline.project(["options"]).overlaps
+    assert rent.pipeline.project(["options"], dates=True).overlaps
+    for value in ("2015-12-08", "2015-12-8", "2016-02-29"):
+        assert pricing.parse_date(value) == \
+            datetime.strptime(value, '%Y-%m-%d')
+    with pytest.raises(ValueError):
+        pricing.parse_date("2015-13-08")
+
+    # Projections with settlement and analytics stages run every pricing
+    # stage
+    reports = {}
+    for fields in (None, ["options"], ["price"]):
+        paths = [str(tmp_path / "settlement.json"),
+                 str(tmp_path / "summary.json")]
+        main.process_write_data(
+            "data/input.json", output_path, fields=fields,
+            settlement_path=paths[0], summary_path=paths[1])
+        reports[fields and fields[0]] = []
+        for path in paths:
+            with open(path) as read_file:
+                reports[fields and fields[0]].append(json.load(read_file))
+    assert reports["options"] == reports["price"] == reports[None]
+    assert reports[None][0]['settlements']
+
+def test_rate_cards():
+    """Compare rate cards quotes with rent.Rental costs."""
+    generator = random.Random(0)
+    cars = [{'id': car_id, 'price_per_day': generator.randint(-100, 10000),
+             'price_per_km': generator.randint(-5, 50)}
+            for car_id in range(1, 20)]
+    rate_cards = ratecard.RateCards(cars)
+    options = [{'id': 1, 'type': "gps"}, {'id': 2, 'type': "baby_seat"},
+               {'id': 3, 'type': "additional_insurance"}]
+
+    for rental_id in range(2000):
+        car = generator.choice(cars)
+        end_day = generator.randint(0, 60)
+        rental = rent.Rental({
+            'id': rental_id, 'car_id': car['id'],
+            'start_date': "2015-01-01",
+            'end_date': (datetime(2015, 1, 1) + timedelta(
+                days=end_day - 1)).strftime('%Y-%m-%d'),
+            'distance': generator.randint(-10, 3000)})
+        for option in generator.sample(options, generator.randint(0, 3)):
+            rental.add_option(option)
+        try:
+            rental.compute_costs(car)
+        except rent.NegativePrice:
+            with pytest.raises(rent.NegativePrice):
+                rate_cards.quote(car['id'], rental.start_date,
+                                 rental.end_date, rental.distance,
+                                 rental.options)
+            continue
+
+        quote = rate_cards.quote(car['id'], rental.start_date,
+                                 rental.end_date, rental.distance,
+                                 rental.options)
+        assert quote.duration == rental.duration
+        assert quote.price == rental.price
+        assert quote.commission == rental.commission
+        assert quote.get_actions() == rental.get_actions()
+
+    quote = rate_cards.quote(1, "2015-12-8", "2015-12-8", 0)
+    assert quote.duration == 1
+    with pytest.raises(KeyError):
+        rate_cards.quote(0, "2015-12-8", "2015-12-8", 0)
+    with pytest.raises(rent.OptionNotFound):
+        rate_cards.quote(1, "2015-12-8", "2015-12-8", 0,
+                         [{'id': 4, 'type': "unknown"}])
+
+def test_fixed_point():
+    """Compare FixedPointEngine costs with PricingEngine costs, and exact
+    mode costs with exact decimal amounts rounded half to even."""
+    assert [fixedpoint.get_multiplier_tenths(duration)
+            for duration in (1, 2, 4, 5, 10, 11, 12)] == \
+        [10, 19, 37, 44, 79, 84, 89]
+    assert [fixedpoint.round_half_even(numerator, 10)
+            for numerator in (-25, -15, 5, 15, 24, 26)] == \
+        [-2, -2, 0, 2, 2, 3]
+    assert [fixedpoint.to_double(Fraction(value))
+            for value in (0, 1, -3, 2 ** 53 + 1, Fraction(1, 10))] == \
+        [0, 1, -3, 2 ** 53, Fraction(0.1)]
+
+    generator = random.Random(0)
+    for config in (rent.cfg, {'commission_base': 0.275,
+                              'insurance_commission_part': 0.35,
+                              'assistance_fee_per_day': 99.5,
+                              'options_prices': {}}):
+        fixed_point = fixedpoint.FixedPointEngine(config)
+        exact_fixed_point = fixedpoint.FixedPointEngine(config, exact=True)
+        pricing_engine = engine.PricingEngine(config)
+        commission_base = Fraction(repr(config['commission_base']))
+        insurance_part = Fraction(repr(config['insurance_commission_part']))
+        assistance_fee = Fraction(repr(config['assistance_fee_per_day']))
+        # Owner fee of base prices ending with 5 cents is a half cent tie
+        for base_price in list(range(0, 2000, 5)) + [
+                generator.randint(0, 10 ** 9) for _ in range(2000)] + [
+                generator.randint(0, 10 ** 20) for _ in range(100)]:
+            duration = generator.randint(1, 60)
+            assert fixed_point.get_commission(base_price, duration, 0, 0) \
+                == pricing_engine.get_commission(base_price, duration, 0, 0)
+            exact_fixed = exact_fixed_point.get_commission(base_price,
+                                                           duration, 0, 0)
+            for key, exact in (
+                    ('owner_fee', base_price * (1 - commission_base)),
+                    ('insurance_fee',
+                     base_price * commission_base * insurance_part),
+                    ('assistance_fee', duration * assistance_fee),
+                    ('drivy_fee',
+                     base_price * commission_base * (1 - insurance_part)
+                     - duration * assistance_fee)):
+                assert exact_fixed[key] == round(exact)
+
+    fixed_point = fixedpoint.FixedPointEngine()
+    exact_fixed_point = fixedpoint.FixedPointEngine(exact=True)
+    pricing_engine = engine.PricingEngine()
+    for _ in range(5000):
+        duration = generator.randint(1, 400)
+        # Integer, decimal and beyond double precision prices
+        prices = [generator.randint(0, 5000), generator.randint(0, 10 ** 5),
+                  generator.randint(0, 50)]
+        draw = generator.random()
+        if draw < 0.3:
+            prices = [price / 100 for price in prices]
+        elif draw < 0.35:
+            prices = [generator.randint(0, 10 ** 17) for _ in prices]
+        assert fixed_point.get_base_price(duration, *prices) == \
+            pricing_engine.get_base_price(duration, *prices)
+        exact = Fraction(fixedpoint.get_multiplier_tenths(duration), 10) * \
+            Fraction(repr(prices[1])) + \
+            Fraction(repr(prices[0])) * Fraction(repr(prices[2]))
+        assert exact_fixed_point.get_base_price(duration, *prices) == \
+            round(exact)
+
+    # Documented exact mode differences
+    assert exact_fixed_point.get_commission(45, 1, 0, 0)['owner_fee'] == 32
+    assert fixed_point.get_commission(45, 1, 0, 0)['owner_fee'] == \
+        pricing_engine.get_commission(45, 1, 0, 0)['owner_fee'] == 31
+
+    with open(get_file("data/input.json")) as read_file:
+        data = json.load(read_file, object_hook=engine.input_hook)
+    # 2000.5 + 1000 base price is rounded to even
+    data['cars'][0]['price_per_day'] = 2000.5
+    output = fixed_point.get_output(data)
+    assert output['rentals'][0]['actions'][0]['amount'] == 3700
+    assert output == exact_fixed_point.get_output(data) == \
+        pricing_engine.get_output(data)
+    with open(get_file("data/input.json")) as read_file:
+        data = json.load(read_file, object_hook=engine.input_hook)
+    with open(get_file("data/expected_output.json")) as read_file:
+        assert fixed_point.get_output(data) == json.load(read_file)
+
+def test_duplicates():
+    """Test repeated cars and rentals ids policies."""
+    # Dense ids from an offset in bitmap
+    ids = list(range(1000000, 1200000))
+    id_set = pricing.IdSet.from_ids(ids + ["a", None])
+    assert len(id_set.bitmap) == 200000 // 8
+    for item_id in ids + [10 ** 12, -1, "a", None]:
+        assert not id_set.add(item_id)
+    assert not id_set.others - {10 ** 12, -1, "a", None}
+    assert id_set.add(1000000) and id_set.add(1199999) and \
+        id_set.add(10 ** 12) and id_set.add(None)
+    # Sparse ids in set
+    assert not pricing.IdSet.from_ids([1, 10 ** 9]).bitmap
+
+    input_json = json.dumps({
+        'cars': [{'id': 1, 'price_per_day': 2000, 'price_per_km': 10},
+                 {'id': 1, 'price_per_day': 3000, 'price_per_km': 15}],
+        'rentals': [
+            {'id': 1, 'car_id': 1, 'start_date': "2015-12-8",
+             'end_date': "2015-12-8", 'distance': 100},
+            {'id': 2, 'car_id': 1, 'start_date': "2015-12-10",
+             'end_date': "2015-12-10", 'distance': 100},
+            {'id': 1, 'car_id': 1, 'start_date': "2015-12-12",
+             'end_date': "2015-12-13", 'distance': 100}],
+        'options': []})
+
+    outputs = {}
+    for policy in pricing.DUPLICATE_POLICIES:
+        hook = rent.pipeline.with_duplicates(policy).load_hook
+        outputs[policy] = json.loads(input_json, object_hook=hook)
+        # Engine shares repeated ids selection
+        rentals, errors = engine.PricingEngine().price_rentals(
+            json.loads(input_json, object_hook=engine.input_hook),
+            duplicates=policy)
+        assert dict({'rentals': [rental.get_dict() for rental in rentals]},
+                    **errors) == outputs[policy]
+
+    # Last car and rental: 2 days of 3000 + 100 km at 15
+    assert [(rental['id'], rental['actions'][0]['amount'])
+            for rental in outputs['last-wins']['rentals']] == \
+        [(1, 7200), (2, 4500)]
+    assert outputs['last-wins']['duplicate_cars'] == \
+        [{'car_id': 1, 'index': 0}]
+    assert outputs['last-wins']['duplicate_rentals'] == \
+        [{'rental_id': 1, 'index': 0}]
+    assert [(rental['id'], rental['actions'][0]['amount'])
+            for rental in outputs['first-wins']['rentals']] == \
+        [(1, 3000), (2, 3000)]
+    assert outputs['first-wins']['duplicate_rentals'] == \
+        [{'rental_id': 1, 'index': 2}]
+    assert [rental['id'] for rental in outputs['reject']['rentals']] == [2]
+    assert outputs['reject']['duplicate_cars'] == \
+        [{'car_id': 1, 'index': 0}, {'car_id': 1, 'index': 1}]
+    assert outputs['reject']['duplicate_rentals'] == \
+        [{'rental_id': 1, 'index': 0}, {'rental_id': 1, 'index': 2}]
+
+    # Levels 1 to 4 pipelines keep every rental
+    assert pricing.Pipeline(rent.Rental).prepare_rentals(json.loads(
+        input_json, object_hook=engine.input_hook))[1][2].id == 1
+    with pytest.raises(ValueError):
+        rent.pipeline.with_duplicates("unknown")
+    # Overlaps don't depend on ids selection, options need it
+    data = json.loads(input_json.replace("2015-12-10", "2015-12-8"),
+                      object_hook=engine.input_hook)
+    _, rentals, errors = pricing.Pipeline(
+        rent.Rental, overlaps=True).prepare_rentals(data)
+    assert len(rentals) == 3
+    assert errors['overlapping_rentals'] == [
+        {'car_id': 1, 'rental_id': 2, 'overlapping_rental_id': 1}]
+    with pytest.raises(ValueError):
+        pricing.Pipeline(rent.Rental, options=True)
+
+def test_partitions(tmp_path):
+    """Compare partitioned output files with output rentals."""
+    with open(get_file("data/expected_output.json")) as read_file:
+        expected_output = json.load(read_file)
+    expected_rentals = {rental['id']: rental
+                        for rental in expected_output['rentals']}
+
+    for key, partitions in (("car", 2), ("month", 16)):
+        directory = str(tmp_path / key)
+        main.process_write_data("data/input.json", directory,
+                                partition_key=key, partitions=partitions)
+        with open(os.path.join(directory, partition.MANIFEST_NAME)) as \
+                read_file:
+            manifest = json.load(read_file)
+
+        assert manifest['key'] == key
+        rentals = []
+        for entry in manifest['partitions']:
+            partition_rentals = partition.load_partition(
+                directory, entry)['rentals']
+            assert len(partition_rentals) == entry['rentals']
+            rentals.extend(partition_rentals)
+        assert sorted(rentals, key=lambda rental: rental['id']) == \
+            sorted(expected_rentals.values(),
+                   key=lambda rental: rental['id'])
+
+    assert [(entry['partition'], entry['rentals'])
+            for entry in manifest['partitions']] == \
+        [("month-2015-03", 1), ("month-2015-07", 1), ("month-2015-12", 1)]
+
+    # Options only projection parses dates of month partitions
+    main.process_write_data("data/input.json", str(tmp_path / "options"),
+                            fields=["options"], partition_key="month")
+    with open(str(tmp_path / "options" / partition.MANIFEST_NAME)) as \
+            read_file:
+        assert [(entry['partition'], entry['rentals'])
+                for entry in json.load(read_file)['partitions']] == \
+            [(entry['partition'], entry['rentals'])
+             for entry in manifest['partitions']]
+
+    entry = manifest['partitions'][0]
+    with open(os.path.join(directory, entry['path']), "ab") as write_file:
+        write_file.write(b" ")
+    with pytest.raises(ValueError):
+        partition.load_partition(directory, entry)
+
+def test_sweep(tmp_path):
+    """Compare sweep configs results with one PricingEngine run per
+    config."""
+    with open(get_file("data/sweep.json")) as read_file:
+        configs = json.load(read_file)
+    output_path = str(tmp_path / "sweep.json")
+    sweep.process_write_sweep(get_file("data/input.json"),
+                              get_file("data/sweep.json"), output_path,
+                              rental_outputs=True)
+    with open(output_path) as read_file:
+        output = json.load(read_file)
+
+    assert [result['name'] for result in output['configs']] == list(configs)
+    for result, sweep_config in zip(output['configs'],
+                                    configs.values()):
+        with open(get_file("data/input.json")) as read_file:
+            data = json.load(read_file, object_hook=engine.input_hook)
+        priced_rentals, _ = engine.PricingEngine(
+            sweep_config).price_rentals(data)
+        assert result['rentals'] == [priced.get_dict()
+                                     for priced in priced_rentals]
+        assert result['priced'] + result['unpriced'] == len(priced_rentals)
+        assert result['totals']['driver'] == sum(
+            priced.price for priced in priced_rentals)
+        for key, actor in rent.ACTORS.items():
+            assert result['totals'][actor] == sum(
+                priced.commission.get(key, 0) for priced in priced_rentals)
+
+    # Current config is priced as expected output, baby seat unknown in
+    # last config
+    with open(get_file("data/expected_output.json")) as read_file:
+        assert output['configs'][0]['rentals'] == \
+            json.load(read_file)['rentals']
+    assert output['configs'][2]['unpriced'] == 1
+
+    with pytest.raises(config.ConfigError):
+        sweep.load_sweep(get_file("data/input.json"))
@@ -0,0 +1,721 @@
+"""Shared pricing core of all levels.
+Defines Rental class: constructed from input json, costs computed by the
+pricing stages of its level: discount, base price, options and commission.
+Every stage computes its intermediate once and stores it on the rental for
+the next stages, with pricing functions of a cfg also used by level5
+engines.
+Defines IdSet and select_unique: repeated cars and rentals ids detection
+with reject, first-wins or last-wins policy.
+Defines Pipeline: prepares input, prices rentals and outputs them as
+level's load_hook.
+"""
+from bisect import bisect_right
+from datetime import datetime
+from functools import lru_cache
+from operator import attrgetter, itemgetter
+
+# Output "who" name of each commission key: "_fee" removed from the end
+ACTORS = {key: key.replace('_fee', '') for key in
+          ('owner_fee', 'insurance_fee', 'assistance_fee', 'drivy_fee')}
+
+
+class NegativePrice(Exception):
+    """NegativePrice class for exceptions"""
+    pass
+
+
+class OptionNotFound(Exception):
+    """OptionNotFound class for exceptions: if additional feature is not
+    configured"""
+
+    def __init__(self, option_id, name):
+        self.option_id = option_id
+        self.name = name
+
+    # Error message
+    def __str__(self):
+        return "Option id %d with name %s not found." % \
+            (self.option_id, self.name)
+
+
+def get_discount_multiplier(duration):
+    """Compute discount multiplier based on rental duration."""
+    # 1st day no discount
+    multiplier = 1
+    # From day 2 to 4, 10% discount
+    if duration > 1:
+        multiplier = multiplier + \
+            (duration - 1) * \
+            0.9 if duration < 4 else multiplier + 3 * 0.9
+    # From day 5 to 10, 30% discount
+    if duration > 4:
+        multiplier = multiplier + \
+            (duration - 4) * \
+            0.7 if duration < 10 else multiplier + 6 * 0.7
+    # From day 11, 50% discount
+    if duration > 10:
+        multiplier = multiplier + (duration - 10) * 0.5
+    return multiplier
+
+
+# Discount multipliers by duration up to day 10, computed once
+DISCOUNT_DAYS = 10
+DISCOUNT_TABLE = tuple(get_discount_multiplier(duration)
+                       for duration in range(DISCOUNT_DAYS + 1))
+# From day 11, 50% discount
+DISCOUNT_TAIL = 0.5
+
+
+def get_table_multiplier(duration):
+    """Return discount multiplier from DISCOUNT_TABLE, identical to
+    get_discount_multiplier()."""
+    if duration <= DISCOUNT_DAYS:
+        return DISCOUNT_TABLE[max(duration, 0)]
+    return DISCOUNT_TABLE[DISCOUNT_DAYS] + \
+        (duration - DISCOUNT_DAYS) * DISCOUNT_TAIL
+
+
+# Parsed dates cache size: rentals of a batch share few distinct dates
+DATES_CACHE_SIZE = 1 << 16
+
+
+@lru_cache(maxsize=DATES_CACHE_SIZE)
+def parse_date(value):
+    """Return datetime of input json date: zero padded dates with C
+    fromisoformat, others (e.g. 2015-12-8) with strptime. datetimes are
+    immutable: a date repeated in input is parsed once."""
+    if len(value) == 10 and value[4] == value[7] == '-' and \
+            value[:4].isdigit() and value[5:7].isdigit() and \
+            value[8:].isdigit():
+        return datetime.fromisoformat(value)
+    return datetime.strptime(value, '%Y-%m-%d')
+
+
+def check_prices(duration, distance, price_per_day, price_per_km):
+    """Raise NegativePrice if a price component is negative."""
+    if duration <= 0 or distance < 0 or price_per_day < 0 or \
+            price_per_km < 0:
+        raise NegativePrice
+
+
+def get_base_price(multiplier, distance, price_per_day, price_per_km):
+    """Return days and distance price, excluding options."""
+    day_price = multiplier * price_per_day
+    distance_price = distance * price_per_km
+    return int(round(day_price + distance_price))
+
+
+def get_options_price(cfg, options):
+    """Return additional features price dict of options list with price for
+    each actor.
+    Raise OptionNotFound if an option is not configured in cfg."""
+    owner_fee = drivy_fee = 0
+    for option in options:
+        try:
+            prices = cfg['options_prices'].get(option['type'])
+            owner_fee += prices.get('owner_fee', 0)
+            drivy_fee += prices.get('drivy_fee', 0)
+        except AttributeError as option_not_configured:
+            raise OptionNotFound(option['id'], option['type']) \
+                from option_not_configured
+
+    return {"owner_fee": owner_fee, "drivy_fee": drivy_fee}
+
+
+def get_platform_commission(cfg, base_price, duration, options_price):
+    """Return insurance, assistance and drivy fees dict of base price,
+    duration and additional features price per actor."""
+    commission = base_price * cfg['commission_base']
+    insurance_part = cfg['insurance_commission_part']
+    assistance_fee = duration * cfg['assistance_fee_per_day']
+    return {
+        'insurance_fee': int(round(commission * insurance_part)),
+        'assistance_fee': int(round(assistance_fee)),
+        'drivy_fee': int(round(
+            commission * (1 - insurance_part) - assistance_fee))
+        + options_price.get('drivy_fee', 0) * duration
+    }
+
+
+def get_commission(cfg, base_price, duration, options_price):
+    """Return owner, insurance, assistance and drivy fees dict of base
+    price, duration and additional features price per actor."""
+    # Owner is added first so get_actions() iterates it first
+    return {
+        'owner_fee': int(round(base_price * (1 - cfg['commission_base'])))
+        + options_price.get('owner_fee', 0) * duration,
+        **get_platform_commission(cfg, base_price, duration, options_price)
+    }
+
+
+def apply_discount(rental, car):
+    """Discount stage: day price multiplier decreasing with duration."""
+    rental.multiplier = get_table_multiplier(rental.duration)
+
+
+def compute_base_price(rental, car):
+    """Base price stage: days and distance price, excluding options."""
+    price_per_day = car.get('price_per_day', 0)
+    price_per_km = car.get('price_per_km', 0)
+    check_prices(rental.duration, rental.distance, price_per_day,
+                 price_per_km)
+    rental.base_price = get_base_price(rental.multiplier, rental.distance,
+                                       price_per_day, price_per_km)
+
+
+def add_options_price(rental, car):
+    """Options stage: additional features price per actor."""
+    rental.options_price = rental.get_options_price()
+
+
+def compute_price(rental, car):
+    """Price stage: base price and additional features price."""
+    rental.price = rental.base_price + \
+        sum(rental.options_price.values()) * rental.duration
+
+
+def compute_platform_commission(rental, car):
+    """Commission stage: insurance, assistance and drivy fees."""
+    rental.commission = get_platform_commission(
+        rental.cfg, rental.base_price, rental.duration, rental.options_price)
+
+
+def compute_commission(rental, car):
+    """Commission stage: owner, insurance, assistance and drivy fees."""
+    rental.commission = get_commission(
+        rental.cfg, rental.base_price, rental.duration, rental.options_price)
+
+
+# Output fields of a projection, in output order
+FIELDS = ('price', 'options', 'actions')
+
+
+class Rental:
+    """Class representing a Rental entry. Level subclasses set cfg,
+    pricing_stages run in order by compute_costs() and get_dict output
+    format."""
+
+    # Level pricing config
+    cfg = {}
+    # Level pricing stages: functions(rental, car)
+    pricing_stages = (compute_base_price, compute_price)
+    # Dates and duration are parsed unless output needs no pricing
+    parse_dates = True
+    # Output fields of get_dict(): all level fields unless projected
+    fields = None
+
+    def __init__(self, json_data):
+        """Construct object from loaded json."""
+        self.id = json_data['id']
+        self.car_id = json_data['car_id']
+        self.distance = json_data['distance']
+
+        # Compute rental duration in days
+        if self.parse_dates:
+            self.start_date = parse_date(json_data['start_date'])
+            self.end_date = parse_date(json_data['end_date'])
+            self.duration = (self.end_date - self.start_date).days + 1
+        else:
+            self.start_date = self.end_date = None
+            self.duration = 0
+
+        self.price = 0
+
+        # Day price multiplier: no discount unless discount stage
+        self.multiplier = self.duration
+
+        # Rental additional features list
+        self.options = []
+
+        # Additional features price per actor, options stage initializes it
+        self.options_price = {}
+
+        # Base price: excluding additional features
+        self.base_price = 0
+
+        # Empty commission dict, commission stage initializes it
+        self.commission = {}
+
+    def compute_costs(self, car):
+        """compute rental's price and commissions with level stages."""
+        for stage in self.pricing_stages:
+            stage(self, car)
+
+    def get_actions(self):
+        """Return actions: how much money must be
+        debited/credited for each actor."""
+        # Initialize list with total price debit to driver
+        rental_actions = [
+            {
+                "who": "driver",
+                "type": "debit",
+                "amount": self.price
+            }]
+
+        # Iterate commission list and append credit action for each actor.
+        for key in self.commission:
+            rental_actions.append({
+                "who": ACTORS[key],
+                "type": "credit",
+                "amount": self.commission[key]
+            })
+        return rental_actions
+
+    def add_option(self, option):
+        """Add additional feature to the rental."""
+        self.options.append(option)
+
+    def get_options_price(self):
+        """Return additional features price dict with price for each actor."""
+        return get_options_price(self.cfg, self.options)
+
+    def get_price_dict(self):
+        """Return output dictionary: price (levels 1 and 2)."""
+        return {'id': self.id, 'price': self.price}
+
+    def get_commission_dict(self):
+        """Return output dictionary: price and commission (level 3)."""
+        return {
+            'id': self.id,
+            'price': self.price,
+            'commission': self.commission
+        }
+
+    def get_actions_dict(self):
+        """Return output dictionary: actions (level 4)."""
+        return {
+            'id': self.id,
+            'actions': self.get_actions()
+        }
+
+    def get_options_dict(self):
+        """Return output dictionary: options and actions (level 5)."""
+        return {
+            'id': self.id,
+            "options": [option['type'] for option in self.options],
+            'actions': self.get_actions()
+        }
+
+    def get_fields_dict(self, fields):
+        """Return output dictionary of projection fields."""
+        output = {'id': self.id}
+        for field in fields:
+            if field == 'price':
+                output['price'] = self.price
+            elif field == 'options':
+                output['options'] = [option['type']
+                                     for option in self.options]
+            else:
+                output['actions'] = self.get_actions()
+        return output
+
+    get_dict = get_price_dict
+
+    @classmethod
+    def project(cls, fields, pricing=False, dates=False):
+        """Return Rental subclass running only the pricing stages needed by
+        projection fields (price, options, actions) and outputting them.
+        pricing: run every pricing stage anyway, e.g. priced rentals are
+        added to settlement or analytics stages.
+        dates: parse dates even if no stage needs them, e.g. rentals are
+        partitioned by month."""
+        unknown_fields = set(fields) - set(FIELDS)
+        if unknown_fields:
+            raise ValueError("Unknown projection fields: %s" %
+                             ", ".join(sorted(unknown_fields)))
+
+        fields = tuple(field for field in FIELDS if field in fields)
+        stages = cls.pricing_stages
+        if 'actions' not in fields and not pricing:
+            # Price is complete after price stage, options need no stage
+            stages = stages[:stages.index(compute_price) + 1] \
+                if 'price' in fields else ()
+
+        return type(cls.__name__, (cls,), {
+            'pricing_stages': stages,
+            'parse_dates': bool(stages) or dates,
+            'fields': fields,
+            'get_dict': lambda self: self.get_fields_dict(fields)
+        })
+
+
+class RentalIndex:
+    """Class indexing rentals by car over day ordinals: intervals sorted by
+    start day with running maximum end day, for overlaps (double-booked
+    cars) and date range queries."""
+
+    def __init__(self, rentals):
+        """Construct index from rentals iterable."""
+        intervals = {}
+        for rental in rentals:
+            start_day = rental.start_date.toordinal()
+            end_day = rental.end_date.toordinal()
+            # Negative durations are not intervals, rental can't be priced
+            if end_day >= start_day:
+                intervals.setdefault(rental.car_id, []).append(
+                    (start_day, end_day, rental))
+
+        # {car_id: (start days, end days, running max end days, rentals)}
+        self.cars = {}
+        for car_id, car_intervals in intervals.items():
+            car_intervals.sort(key=itemgetter(0, 1))
+            max_ends = []
+            max_end = None
+            for _, end_day, _ in car_intervals:
+                max_end = end_day if max_end is None else max(max_end, end_day)
+                max_ends.append(max_end)
+            self.cars[car_id] = (
+                [interval[0] for interval in car_intervals],
+                [interval[1] for interval in car_intervals],
+                max_ends,
+                [interval[2] for interval in car_intervals])
+
+    def get_overlaps(self):
+        """Return overlapping rentals list: each rental starting before the
+        end of a previous rental of the same car."""
+        overlaps = []
+        for car_id, (starts, ends, _, rentals) in self.cars.items():
+            last_end = None
+            last_rental = None
+            for start_day, end_day, rental in zip(starts, ends, rentals):
+                if last_end is not None and start_day <= last_end:
+                    overlaps.append({
+                        'car_id': car_id,
+                        'rental_id': rental.id,
+                        'overlapping_rental_id': last_rental.id})
+                if last_end is None or end_day > last_end:
+                    last_end = end_day
+                    last_rental = rental
+        return overlaps
+
+    def get_active(self, start_date, end_date=None, car_id=None):
+        """Return rentals active on any day from start_date to end_date
+        (dates or datetimes), end_date defaults to start_date.
+        car_id: only search this car."""
+        first_day = start_date.toordinal()
+        last_day = first_day if end_date is None else end_date.toordinal()
+        if car_id is None:
+            cars = self.cars.values()
+        else:
+            cars = [self.cars[car_id]] if car_id in self.cars else []
+
+        active = []
+        for starts, ends, max_ends, rentals in cars:
+            car_active = []
+            # Rentals starting after last_day can't be active, and running
+            # max end tells when no earlier rental reaches first_day
+            index = bisect_right(starts, last_day) - 1
+            while index >= 0 and max_ends[index] >= first_day:
+                if ends[index] >= first_day:
+                    car_active.append(rentals[index])
+                index -= 1
+            active.extend(reversed(car_active))
+        return active
+
+
+# Repeated ids policies: drop every item of a repeated id, keep first item,
+# or keep last item at first item position (as a dict built from ids)
+REJECT = 'reject'
+FIRST_WINS = 'first-wins'
+LAST_WINS = 'last-wins'
+DUPLICATE_POLICIES = (REJECT, FIRST_WINS, LAST_WINS)
+
+# IdSet bitmap: at most BITMAP_DENSITY bits per integer id of its range,
+# and MAX_BITMAP_IDS bits
+BITMAP_DENSITY = 64
+MAX_BITMAP_IDS = 1 << 32
+
+
+class IdSet:
+    """Class set of ids in bounded memory: integer ids of a range in a
+    bitmap of one bit per id from the first id of the range (a billion ids
+    take 125 MB), other ids in a set."""
+
+    def __init__(self, first_id=0, last_id=-1):
+        """Construct empty set with bitmap of first_id to last_id range,
+        empty by default."""
+        self.offset = first_id
+        self.size = max(last_id - first_id + 1, 0)
+        self.bitmap = bytearray((self.size + 7) >> 3)
+        self.others = set()
+
+    @classmethod
+    def from_ids(cls, ids):
+        """Return empty set with bitmap range of integer ids iterable, if
+        they are dense enough for a bitmap to be smaller than a set."""
+        first_id = last_id = None
+        count = 0
+        for item_id in ids:
+            if type(item_id) is int:
+                count += 1
+                if first_id is None:
+                    first_id = last_id = item_id
+                elif item_id < first_id:
+                    first_id = item_id
+                elif item_id > last_id:
+                    last_id = item_id
+        if count and last_id - first_id < min(BITMAP_DENSITY * count,
+                                              MAX_BITMAP_IDS):
+            return cls(first_id, last_id)
+        return cls()
+
+    def add(self, item_id):
+        """Add id to set. Return True if it was already in set."""
+        if type(item_id) is int:
+            index = item_id - self.offset
+            if 0 <= index < self.size:
+                mask = 1 << (index & 7)
+                index >>= 3
+                if self.bitmap[index] & mask:
+                    return True
+                self.bitmap[index] |= mask
+                return False
+
+        if item_id in self.others:
+            return True
+        self.others.add(item_id)
+        return False
+
+
+def remove_duplicates(items, get_id, policy):
+    """Return items list without repeated ids items dropped by policy, and
+    dropped items list of (index in items, id)."""
+    seen = IdSet.from_ids(get_id(item) for item in items)
+    repeated = set()
+    for item in items:
+        item_id = get_id(item)
+        if seen.add(item_id):
+            repeated.add(item_id)
+    if not repeated:
+        return items, []
+
+    # {repeated id: (index, item)} of last item
+    last_items = {}
+    if policy == LAST_WINS:
+        for index, item in enumerate(items):
+            item_id = get_id(item)
+            if item_id in repeated:
+                last_items[item_id] = (index, item)
+
+    unique_items = []
+    dropped = []
+    kept_ids = set()
+    for index, item in enumerate(items):
+        item_id = get_id(item)
+        if item_id not in repeated:
+            unique_items.append(item)
+        elif policy == REJECT:
+            dropped.append((index, item_id))
+        elif policy == FIRST_WINS:
+            if item_id in kept_ids:
+                dropped.append((index, item_id))
+            else:
+                kept_ids.add(item_id)
+                unique_items.append(item)
+        else:
+            last_index, last_item = last_items[item_id]
+            if item_id not in kept_ids:
+                kept_ids.add(item_id)
+                unique_items.append(last_item)
+            if index != last_index:
+                dropped.append((index, item_id))
+    return unique_items, dropped
+
+
+def log(messages, message):
+    """Print/log message on backend, or append it to messages list if
+    given, e.g. to keep prints out of timed or threaded pricing."""
+    if messages is None:
+        print(message)
+    else:
+        messages.append(message)
+
+
+def select_unique(dct, policy, messages=None):
+    """Remove repeated cars and rentals ids of main input dict with policy.
+    Detection only keeps IdSet bitmaps and repeated ids, but items are
+    loaded in memory and returned cars dict (as pipeline rentals dict for
+    options) holds every car.
+    messages: list receiving backend messages instead of printing them.
+    Return cars dict, rentals list and errors dict to be added to
+    output."""
+    if policy not in DUPLICATE_POLICIES:
+        raise ValueError("Unknown duplicates policy: %s" % policy)
+
+    errors = {}
+    cars, dropped_cars = remove_duplicates(
+        dct['cars'], lambda car: car.get("id"), policy)
+    rentals, dropped_rentals = remove_duplicates(
+        dct['rentals'], attrgetter('id'), policy)
+    # Repeated ids: print/log on backend. duplicate_cars and
+    # duplicate_rentals will be added to output.json and can be handled
+    # by input.json provider.
+    for name, dropped in (('car', dropped_cars),
+                          ('rental', dropped_rentals)):
+        for index, item_id in dropped:
+            log(messages, "Duplicate %s id %s at index %d dropped." %
+                (name, item_id, index))
+        if dropped:
+            errors['duplicate_%ss' % name] = [
+                {'%s_id' % name: item_id, 'index': index}
+                for index, item_id in dropped]
+
+    return {car.get("id"): car for car in cars}, rentals, errors
+
+
+class Pipeline:
+    """Class running a level pricing: prepares input rentals, computes their
+    costs with level Rental pricing_stages and creates output."""
+
+    def __init__(self, rental_class, duplicates=None, options=False,
+                 overlaps=False):
+        """Construct pipeline.
+        duplicates: policy of repeated cars and rentals ids, reported in
+        errors (see select_unique). None keeps every rental.
+        options: add input options to rentals, report missing rentals.
+        Options select rentals from ID: requires a duplicates policy.
+        overlaps: report double-booked cars."""
+        if duplicates is not None and duplicates not in DUPLICATE_POLICIES:
+            raise ValueError("Unknown duplicates policy: %s" % duplicates)
+        if options and duplicates is None:
+            raise ValueError("Options require a duplicates policy")
+        self.rental_class = rental_class
+        self.duplicates = duplicates
+        self.options = options
+        self.overlaps = overlaps
+
+    def project(self, fields, pricing=False, dates=False):
+        """Return pipeline computing and outputting only projection fields,
+        see Rental.project(). Double-booked cars are reported whenever
+        dates are parsed: projections without dates skip the rentals
+        index."""
+        rental_class = self.rental_class.project(fields, pricing, dates)
+        return Pipeline(rental_class, self.duplicates, self.options,
+                        self.overlaps and rental_class.parse_dates)
+
+    def with_duplicates(self, duplicates):
+        """Return pipeline with another repeated ids policy."""
+        return Pipeline(self.rental_class, duplicates, self.options,
+                        self.overlaps)
+
+    def rental_hook(self, dct):
+        """Hook called when loading json: return Rental objects without
+        computing costs."""
+        if "car_id" in dct:
+            return self.rental_class(dct)
+
+        return dct
+
+    def prepare_rentals(self, dct, messages=None):
+        """Add options to rentals of main input dict and check input.
+        messages: list receiving backend messages instead of printing them.
+        Return cars dict, rentals list and errors dict to be added to
+        output."""
+        if self.duplicates is None:
+            # Cars dict to select from ID, every rental kept
+            cars = {car.get("id"): car for car in dct['cars']}
+            rentals = dct['rentals']
+            errors = {}
+        else:
+            cars, rentals, errors = select_unique(dct, self.duplicates,
+                                                  messages)
+
+        if self.options:
+            # Rentals dict to select from ID
+            rentals_by_id = {rental.id: rental for rental in rentals}
+            # Iterate over additional features list and add it to rental.
+            missing_rentals = []
+            for option in dct['options']:
+                try:
+                    rentals_by_id[option['rental_id']].add_option(option)
+                except KeyError:
+                    # If rental is missing to add option: print/log on
+                    # backend. missing_rentals will be added to output.json
+                    # and can be handled by input.json provider.
+                    log(messages,
+                        "Missing rental id %d to compute option id %d." %
+                        (option['rental_id'], option['id']))
+                    missing_rentals.append({
+                        'rental_id': option['rental_id'],
+                        'option_id': option['id']})
+            if missing_rentals:
+                errors['missing_rentals'] = missing_rentals
+
+        if self.overlaps:
+            # Flag double-booked cars: print/log on backend.
+            # overlapping_rentals will be added to output.json and can be
+            # handled by input.json provider.
+            overlapping_rentals = RentalIndex(rentals).get_overlaps()
+            for overlap in overlapping_rentals:
+                log(messages,
+                    "Rental id %d overlaps rental id %d on car id %d." %
+                    (overlap['rental_id'], overlap['overlapping_rental_id'],
+                     overlap['car_id']))
+            if overlapping_rentals:
+                errors['overlapping_rentals'] = overlapping_rentals
+
+        return cars, rentals, errors
+
+    @staticmethod
+    def price_rental(rental, cars, stages=(), messages=None):
+        """Compute rental costs and add it to stages if it could be
+        priced.
+        messages: list receiving backend messages instead of printing them.
+        """
+        try:
+            rental.compute_costs(cars[rental.car_id])
+        except KeyError:
+            # If car is missing to compute rental: print/log on backend.
+            # On output.json price will be 0 and can be
+            # handled by input.json provider.
+            # TBD: add metadata to communicate exceptions.
+            log(messages, "Missing car id %d to compute rental id %d." %
+                (rental.car_id, rental.id))
+        except NegativePrice:
+            # If a component of price is negative: print/log on backend.
+            # On output.json price will be 0 and can be
+            # handled by input.json provider.
+            # TBD: add metadata to communicate exceptions.
+            log(messages,
+                "Negative price component on rental id %d." % rental.id)
+        except OptionNotFound as error_msg:
+            # If an option is not configured print/log on backend.
+            # On output.json price will be 0 and can be
+            # handled by input.json provider.
+            # TBD: add metadata to communicate exceptions.
+            log(messages, str(error_msg))
+        else:
+            for stage in stages:
+                stage.add(rental)
+
+    def price_rentals(self, dct, stages=(), messages=None):
+        """Add options and compute costs of every rental in main input dict.
+        Every priced rental is added to stages: objects with an add(rental)
+        method, e.g. aggregations.
+        messages: list receiving backend messages instead of printing them.
+        Return rentals list and errors dict to be added to output."""
+        cars, rentals, errors = self.prepare_rentals(dct, messages)
+        # Compute price for every rental
+        for rental in rentals:
+            self.price_rental(rental, cars, stages, messages)
+
+        return rentals, errors
+
+    def load_hook(self, dct):
+        """Hook called when loading json."""
+        # Check if it's the main dict and run data processing
+        if "cars" in dct:
+            rentals, errors = self.price_rentals(dct)
+
+            # Create rentals list with desired output
+            result = {'rentals': [rental.get_dict() for rental in rentals]}
+            result.update(errors)
+
+            return result
+
+        # Check if it's one of the rentals dict and return a rental object
+        if "car_id" in dct:
+            return self.rental_class(dct)
+
+        # Default return dict without further processing
+        return dct
@@ -1,8 +1,10 @@
 """Test all levels at once"""
 
+import io
 import os
 import json
 import pytest
+import compare
 import level1.rent
 import level2.rent
 import level3.rent
@@ -38,3 +40,77 @@ def get_expected_output(level):
 def test_hook(test_input, expected):
     """Assert all levels parametrized."""
     assert test_input == expected
+
+
+def test_json_stream():
+    """Compare streamed items with json.load, chunks splitting values."""
+    with open(get_file("level5/data/expected_output.json")) as fil:
+        expected = json.load(fil)
+    expected['missing_rentals'] = [{'rental_id': 12345, 'option_id': 1}]
+    expected['empty'] = []
+    expected['count'] = 1234567
+
+    for chunk_size in (1, 7, 1 << 16):
+        stream = compare.JsonStream(io.StringIO(json.dumps(expected)),
+                                    chunk_size)
+        streamed = {}
+        for key, index, value in stream.iter_items():
+            if index is None:
+                streamed[key] = value
+            else:
+                assert index == len(streamed.setdefault(key, []))
+                streamed[key].append(value)
+        streamed.setdefault('empty', [])
+        assert streamed == expected
+
+
+def test_compare_files(tmp_path):
+    """Check differences found between output and expected files."""
+    expected_path = get_file("level5/data/expected_output.json")
+    with open(expected_path) as fil:
+        output = json.load(fil)
+    output_path = str(tmp_path / "output.json")
+
+    def write_output():
+        """Write output to output_path."""
+        with open(output_path, "w") as fil:
+            json.dump(output, fil)
+
+    write_output()
+    assert compare.compare_files(output_path, expected_path) == []
+
+    output['rentals'][1]['actions'][2]['amount'] += 1
+    output['rentals'][2]['options'].append('gps')
+    write_output()
+    assert compare.compare_files(output_path, expected_path, 10) == [
+        {'path': 'rentals[1].actions[2].amount', 'id': 2,
+         'output': 1021, 'expected': 1020},
+        {'path': 'rentals[2].options', 'id': 3,
+         'output': ['gps'], 'expected': []}]
+    assert len(compare.compare_files(output_path, expected_path)) == 1
+
+    output['rentals'].pop()
+    write_output()
+    assert compare.compare_files(output_path, expected_path, 10)[-1][
+        'path'] == 'rentals[2]'
+
+    # Top-level keys in another order are matched by key
+    output = {'missing_rentals': [{'rental_id': 1, 'option_id': 2}],
+              'count': 3, 'rentals': [{'id': 1}, {'id': 2}]}
+    write_output()
+    expected_path = str(tmp_path / "expected.json")
+    with open(expected_path, "w") as fil:
+        json.dump({'rentals': [{'id': 1}, {'id': 2}], 'count': 3,
+                   'missing_rentals': [{'rental_id': 1, 'option_id': 2}]},
+                  fil)
+    assert compare.compare_files(output_path, expected_path, 10) == []
+
+    output['count'] = 4
+    output['extra'] = True
+    output['rentals'].pop()
+    write_output()
+    assert compare.compare_files(output_path, expected_path, 10) == [
+        {'path': 'rentals[1]', 'id': 2, 'output': None,
+         'expected': {'id': 2}},
+        {'path': 'count', 'id': None, 'output': 4, 'expected': 3},
+        {'path': 'extra', 'id': None, 'output': True, 'expected': None}]